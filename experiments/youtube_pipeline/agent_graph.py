@@ -1,9 +1,10 @@
 import sys
+import asyncio
 import operator
 import functools
 from typing import Annotated, Literal, Sequence, TypedDict
 
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
+from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
@@ -22,6 +23,18 @@ class AgentState(TypedDict):
     voiceover_path: str
     project_path: str
 
+def last_value(old, new):
+    """Reducer that keeps the newest write."""
+    return new
+
+class ParallelAgentState(TypedDict):
+    # nodes running in the same step write concurrently, so every key they share needs a reducer
+    messages: Annotated[Sequence[BaseMessage], operator.add]
+    sender: Annotated[str, last_value]
+    script_path: str
+    voiceover_path: str
+    project_path: str
+
 def create_agent(llm, system_message: str, tools):
     """Create an agent."""
     prompt = ChatPromptTemplate.from_messages(
@@ -75,12 +88,19 @@ def agent_node(state: AgentState, agent, name) -> AgentState:
     except Exception as e:
         return handle_agent_exception(name, e)
 
+SYSTEM_MESSAGES = {
+    "writer_node": "You are an expert YouTube content creator. Create engaging and informative video scripts based on the given topic. Output only the script text, no additional explanations.",
+    "voiceover_node": "You are an AI assistant specialized in creating voiceovers. Use the tts_whisper tool to generate a voiceover for the given script. Return the path to the generated audio file.",
+    "project_setup_node": "You are an AI assistant specialized in setting up DaVinci Resolve projects. Use the create_resolve_project tool to create a new project for the YouTube video. Return the path to the created project.",
+    "audio_node": "You are an AI assistant specialized in managing audio within DaVinci Resolve projects. Use the add_audio_track tool to add the voiceover audio to the project timeline. Confirm when the task is completed.",
+}
+
 # Define agent nodes
 writer_node = functools.partial(
     agent_node,
     agent = create_agent(
         llm,
-        system_message="You are an expert YouTube content creator. Create engaging and informative video scripts based on the given topic. Output only the script text, no additional explanations.",
+        system_message=SYSTEM_MESSAGES["writer_node"],
         tools=[]
     ),
     name = "writer_node"
@@ -90,7 +110,7 @@ voiceover_node = functools.partial(
     agent_node,
     agent = create_agent(
         llm,
-        system_message="You are an AI assistant specialized in creating voiceovers. Use the tts_whisper tool to generate a voiceover for the given script. Return the path to the generated audio file.",
+        system_message=SYSTEM_MESSAGES["voiceover_node"],
         tools=[tts_whisper]
     ),
     name = "voiceover_node"
@@ -100,7 +120,7 @@ project_setup_node = functools.partial(
     agent_node,
     agent = create_agent(
         llm,
-        system_message="You are an AI assistant specialized in setting up DaVinci Resolve projects. Use the create_resolve_project tool to create a new project for the YouTube video. Return the path to the created project.",
+        system_message=SYSTEM_MESSAGES["project_setup_node"],
         tools=[create_resolve_project]
     ),
     name = "project_setup_node"
@@ -110,13 +130,89 @@ audio_node = functools.partial(
     agent_node,
     agent = create_agent(
         llm,
-        system_message="You are an AI assistant specialized in managing audio within DaVinci Resolve projects. Use the add_audio_track tool to add the voiceover audio to the project timeline. Confirm when the task is completed.",
+        system_message=SYSTEM_MESSAGES["audio_node"],
         tools=[add_audio_track]
     ),
     name = "audio_node"
 )
 
 
+def as_node_message(message, name, drop_tool_calls=False) -> AIMessage:
+    """Copy an agent response as a message sent by the named node."""
+    fields = message.dict(exclude={"type", "name"})
+    if drop_tool_calls:
+        # tool calls without their ToolMessages make the next node's chat request fail
+        fields.update(tool_calls=[], invalid_tool_calls=[])
+        fields["additional_kwargs"] = {k: v for k, v in fields.get("additional_kwargs", {}).items() if k != "tool_calls"}
+    return AIMessage(**fields, name=name)
+
+async def async_agent_node(state: ParallelAgentState, agent, name, tools=(), output_key=None, max_tool_rounds=3) -> dict:
+    """Async version of agent_node that runs its own tool calls.
+
+    The tool calls of one response are awaited concurrently, then the agent is called again with
+    their results. Only the keys this node owns are returned, so it can run in parallel with others.
+    """
+    try:
+        tools_by_name = {tool.name: tool for tool in tools}
+        new_messages = []
+        outputs = []
+        result = await agent.ainvoke(state)
+        for _ in range(max_tool_rounds):
+            if not getattr(result, "tool_calls", None):
+                break
+            outputs = await asyncio.gather(
+                *(tools_by_name[call["name"]].ainvoke(call["args"]) for call in result.tool_calls)
+            )
+            new_messages += [as_node_message(result, name)] + [
+                ToolMessage(content=str(output), tool_call_id=call["id"])
+                for call, output in zip(result.tool_calls, outputs)
+            ]
+            result = await agent.ainvoke({**state, "messages": list(state["messages"]) + new_messages})
+        # tool calls still pending once the rounds run out are dropped, nothing will answer them
+        result = as_node_message(result, name, drop_tool_calls=bool(getattr(result, "tool_calls", None)))
+        update = {"messages": new_messages + [result], "sender": name}
+        if output_key and outputs:
+            update[output_key] = str(outputs[-1])
+        return update
+    except Exception as e:
+        return handle_agent_exception(name, e)
+
+def create_async_nodes(llm, tts_tool=tts_whisper, project_tool=create_resolve_project, audio_tool=add_audio_track) -> dict:
+    """Create the async pipeline nodes, with their tools, for the given llm."""
+    def node(name, tools, output_key=None):
+        agent = create_agent(llm, system_message=SYSTEM_MESSAGES[name], tools=tools)
+        return functools.partial(async_agent_node, agent=agent, name=name, tools=tools, output_key=output_key)
+
+    return {
+        "writer_node": node("writer_node", []),
+        "voiceover_node": node("voiceover_node", [tts_tool], "voiceover_path"),
+        "project_setup_node": node("project_setup_node", [project_tool], "project_path"),
+        "audio_node": node("audio_node", [audio_tool]),
+    }
+
+def create_async_graph(llm=llm, parallel: bool = True, **tools) -> StateGraph:
+    """Create the pipeline for `await graph.ainvoke(state)`.
+
+    With parallel, the voiceover (TTS) and the project setup both start after the writer
+    (fan-out), because neither needs the other, and the audio node waits for both (fan-in).
+    Without it, the nodes run one after another, like create_graph.
+    """
+    nodes = create_async_nodes(llm, **tools)
+    graph = StateGraph(ParallelAgentState)
+    for name, node in nodes.items():
+        graph.add_node(name, node)
+    graph.set_entry_point("writer_node")
+    if parallel:
+        graph.add_edge("writer_node", "voiceover_node")
+        graph.add_edge("writer_node", "project_setup_node")
+        graph.add_edge(["voiceover_node", "project_setup_node"], "audio_node")
+    else:
+        graph.add_edge("writer_node", "voiceover_node")
+        graph.add_edge("voiceover_node", "project_setup_node")
+        graph.add_edge("project_setup_node", "audio_node")
+    graph.add_edge("audio_node", END)
+    return graph.compile()
+
 # Define the edge logic
 def router(state) -> Literal["call_tool", "__end__", "continue"]:
     """Router function to determine next steps."""
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+os.environ.setdefault("OPENAI_API_KEY", "not-used") # agent_graph builds its ChatOpenAI at import
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+
+from agent_graph import create_async_graph
+
+# End-to-end latency of the async pipeline, sequential vs. fan-out/fan-in, with a deterministic
+# fake LLM and fake tools that only sleep, so nothing is called over the network
+llm_latency = 0.5   # seconds per LLM call
+tts_latency = 2.0   # seconds of the voiceover tool
+project_latency = 1.5 # seconds of the DaVinci Resolve project tool
+audio_latency = 0.5 # seconds of the add audio track tool
+n_runs = 3
+# ------------
+
+TOOL_ARGS = {
+    "tts_whisper": {"text": "A short script."},
+    "create_resolve_project": {"project_name": "bench", "length": 60, "width": 1920, "height": 1080, "frame_rate": 30},
+    "add_audio_track": {"audio_file_path": "./output.mp3"},
+}
+
+class FakeLLM(RunnableLambda):
+    """Chat model stand-in: calls every bound tool once, then gives its final answer."""
+
+    def __init__(self, latency: float, tools=()):
+        self.latency = latency
+        self.tool_names = [t.name for t in tools]
+        super().__init__(self._respond, afunc=self._arespond)
+
+    def bind_tools(self, tools):
+        return FakeLLM(self.latency, tools)
+
+    def _reply(self, prompt):
+        messages = prompt.to_messages()
+        if self.tool_names and not isinstance(messages[-1], ToolMessage):
+            calls = [{"name": name, "args": TOOL_ARGS[name], "id": f"call_{name}"} for name in self.tool_names]
+            return AIMessage(content="", tool_calls=calls)
+        return AIMessage(content="FINAL ANSWER done")
+
+    def _respond(self, prompt):
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def _arespond(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+# Same names and signatures as the real tools, they block like the real ones do
+@tool
+def tts_whisper(text: str) -> str:
+    """Fake text to speech."""
+    time.sleep(tts_latency)
+    return "./output.mp3"
+
+@tool
+def create_resolve_project(project_name: str, length: int, width: int, height: int, frame_rate: int) -> str:
+    """Fake DaVinci Resolve project creation."""
+    time.sleep(project_latency)
+    return f"./{project_name}.drp"
+
+@tool
+def add_audio_track(audio_file_path: str) -> str:
+    """Fake audio track import."""
+    time.sleep(audio_latency)
+    return f"added {audio_file_path}"
+
+async def run(graph) -> tuple:
+    initial_state = {
+        "messages": [HumanMessage(content="Create a YouTube video about latency")],
+        "sender": "human",
+        "script_path": "",
+        "voiceover_path": "",
+        "project_path": "",
+    }
+    best, state = float("inf"), None
+    for _ in range(n_runs):
+        t0 = time.perf_counter()
+        state = await graph.ainvoke(initial_state)
+        best = min(best, time.perf_counter() - t0)
+    return best, state
+
+async def main():
+    llm = FakeLLM(llm_latency)
+    tools = dict(tts_tool=tts_whisper, project_tool=create_resolve_project, audio_tool=add_audio_track)
+    sequential, seq_state = await run(create_async_graph(llm, parallel=False, **tools))
+    parallel, par_state = await run(create_async_graph(llm, parallel=True, **tools))
+
+    same = all(seq_state[key] == par_state[key] for key in ("voiceover_path", "project_path"))
+    print(f"Same voiceover and project paths in both modes: {same}")
+    print(f"{'mode':<12}{'seconds':>10}")
+    print(f"{'sequential':<12}{sequential:>10.2f}")
+    print(f"{'parallel':<12}{parallel:>10.2f}")
+    print(f"Speedup: {sequential / parallel:.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
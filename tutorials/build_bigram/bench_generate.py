@@ -0,0 +1,61 @@
+import time
+
+import torch
+from torch.nn import functional as F
+
+from bigram import BigramLanguageModel, bigram_log_probs, count_bigrams, device, vocab_size
+
+# generating n_chars characters with the old generate (the whole growing sequence through the
+# model every step) and generate, which samples from the precomputed CDFs of BigramSampler
+# (building the sampler is part of its time), then both paths for batches of independent samples
+n_chars = 100_000
+batch_sizes = [1, 64, 1024]
+# ------------
+
+def generate_full_sequence(model, idx, max_new_tokens, greedy=False):
+    # the generate bigram.py used before: O(n^2) in max_new_tokens, only the last row is ever used
+    for _ in range(max_new_tokens):
+        logits, loss = model(idx)
+        logits = logits[:, -1, :]
+        if greedy:
+            idx_next = torch.argmax(logits, dim=-1, keepdim=True)
+        else:
+            idx_next = torch.multinomial(F.softmax(logits, dim=-1), num_samples=1)
+        idx = torch.cat((idx, idx_next), dim=1)
+    return idx
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+model = BigramLanguageModel(vocab_size).to(device)
+with torch.no_grad():
+    model.token_embedding_table.weight.copy_(bigram_log_probs(count_bigrams('train')))
+context = torch.zeros((1, 1), dtype=torch.long, device=device)
+
+# the random draws differ, so the paths are compared greedily: the same table gives the same characters
+with torch.no_grad():
+    old = generate_full_sequence(model, context, 2000, greedy=True)
+new = model.generate(context, 2000, temperature=0)
+assert torch.equal(old, new), 'generate decodes greedily differently from the full-sequence one'
+
+print(f"{n_chars:,} characters, batch 1")
+print(f"{'path':<16}{'seconds':>10}{'chars/sec':>14}")
+paths = [
+    ('full sequence', lambda: torch.no_grad()(generate_full_sequence)(model, context, n_chars)),
+    ('generate', lambda: model.generate(context, n_chars)),
+]
+for name, fn in paths:
+    _, dt = timed(fn)
+    print(f"{name:<16}{dt:>10.2f}{n_chars / dt:>14,.0f}")
+
+# one generate call for the whole batch, every row an independent sample
+print(f"\n{'batch':<8}{'path':<16}{'seconds':>10}{'chars/sec':>14}")
+for batch_size in batch_sizes:
+    contexts = torch.zeros((batch_size, 1), dtype=torch.long, device=device)
+    steps = max(1, n_chars // batch_size)
+    for name, fn in (('full sequence', lambda: torch.no_grad()(generate_full_sequence)(model, contexts, steps)),
+                     ('generate', lambda: model.generate(contexts, steps))):
+        _, dt = timed(fn)
+        print(f"{batch_size:<8}{name:<16}{dt:>10.2f}{batch_size * steps / dt:>14,.0f}")
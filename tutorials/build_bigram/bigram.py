@@ -1,3 +1,6 @@
+import json
+
+import numpy as np
 import torch
 import torch.nn as nn
 from torch.nn import functional as F
@@ -10,15 +13,20 @@ eval_interval = 300
 learning_rate = 1e-2
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
 eval_iters = 200
+fit = 'count' # 'count' reads the table off the bigram counts in one pass, 'sgd' learns it with AdamW
+smoothing = 1.0 # add-k smoothing of the counts, 0 leaves unseen bigrams impossible
+count_chunk_size = 1 << 24 # tokens counted per chunk, keeps memory flat on large corpora
 # ------------
 
 torch.manual_seed(1337)
 
-with open('wizard_of_oz.txt', 'r', encoding='utf-8') as f:
-    text = f.read()
+# the corpus is encoded once by prepare.py (`python ../build_gpt/prepare.py wizard_of_oz.txt`),
+# which writes train.bin, val.bin and the meta.json vocabulary next to the text
+with open('meta.json', 'r', encoding='utf-8') as f:
+    meta = json.load(f)
 
 # here are all the unique characters that occur in this text
-chars = sorted(list(set(text)))
+chars = meta['chars']
 vocab_size = len(chars)
 # create a mapping from characters to integers
 stoi = { ch:i for i,ch in enumerate(chars) }
@@ -26,19 +34,18 @@ itos = { i:ch for i,ch in enumerate(chars) }
 encode = lambda s: [stoi[c] for c in s] # encoder: take a string, output a list of integers
 decode = lambda l: ''.join([itos[i] for i in l]) # decoder: take a list of integers, output a string
 
-# Train and test splits
-data = torch.tensor(encode(text), dtype=torch.long)
-n = int(0.9*len(data)) # first 90% will be train, rest val
-train_data = data[:n]
-val_data = data[n:]
+# Train and test splits, memory-mapped so RAM stays flat regardless of corpus size
+data_dtype = np.dtype(meta['dtype'])
 
 # data loading
 def get_batch(split):
     # generate a small batch of data of inputs x and targets y
-    data = train_data if split == 'train' else val_data
+    # the memmap is recreated every batch so the pages it touched don't stay referenced
+    data = np.memmap(f'{split}.bin', dtype=data_dtype, mode='r')
     ix = torch.randint(len(data) - block_size, (batch_size,))
-    x = torch.stack([data[i:i+block_size] for i in ix])
-    y = torch.stack([data[i+1:i+block_size+1] for i in ix])
+    # only the sampled windows are read from disk and widened to int64
+    x = torch.stack([torch.from_numpy(data[i:i+block_size].astype(np.int64)) for i in ix])
+    y = torch.stack([torch.from_numpy(data[i+1:i+block_size+1].astype(np.int64)) for i in ix])
     x, y = x.to(device), y.to(device)
     return x, y
 
@@ -56,6 +63,72 @@ def estimate_loss():
     model.train()
     return out
 
+def count_bigrams(split):
+    # (V, V) matrix of how often token b follows token a, from one bincount over the pair ids a*V+b per chunk
+    data = np.memmap(f'{split}.bin', dtype=data_dtype, mode='r')
+    counts = np.zeros(vocab_size * vocab_size, dtype=np.int64)
+    for i in range(0, len(data) - 1, count_chunk_size):
+        chunk = data[i:i+count_chunk_size+1].astype(np.int64) # one token of overlap, for the pair across the boundary
+        counts += np.bincount(chunk[:-1] * vocab_size + chunk[1:], minlength=vocab_size * vocab_size)
+    return torch.from_numpy(counts.reshape(vocab_size, vocab_size))
+
+def bigram_log_probs(counts, smoothing=1.0):
+    # log P(b | a) of the smoothed counts: used as logits, softmax gives back exactly these probabilities
+    counts = counts.double() + smoothing
+    totals = counts.sum(dim=1, keepdim=True)
+    # a token that never occurs before another one gets a uniform row instead of 0/0
+    probs = torch.where(totals > 0, counts / totals.clamp(min=1e-12), torch.full_like(counts, 1.0 / counts.shape[1]))
+    return probs.log().float()
+
+def counted_loss(log_probs, split):
+    # exact mean negative log-likelihood of every bigram in the split, instead of eval_iters random batches
+    counts = count_bigrams(split).to(log_probs.device)
+    # bigrams that never occur add nothing, even where the log-prob is -inf
+    nll = -torch.where(counts > 0, counts * log_probs, torch.zeros_like(log_probs)).sum()
+    return (nll / counts.sum()).item()
+
+class BigramSampler:
+    """ samples from a (V, V) logits table with its cumulative distributions precomputed,
+    so every generated token is a row lookup and a binary search instead of a forward + softmax """
+
+    def __init__(self, logits, temperature=1.0, top_k=None, top_p=None):
+        # the next token only depends on the current one, so temperature, top-k and top-p
+        # are applied once to every row of the table instead of at every step
+        logits = logits.detach().double()
+        if temperature == 0:
+            # greedy: all the mass on the most likely token
+            probs = F.one_hot(torch.argmax(logits, dim=-1), logits.size(-1)).double()
+        else:
+            logits = logits / temperature
+            if top_k is not None:
+                # keep the k largest logits of every row
+                v, _ = torch.topk(logits, min(top_k, logits.size(-1)))
+                logits = logits.masked_fill(logits < v[:, [-1]], float('-inf'))
+            if top_p is not None:
+                # keep the smallest set of most likely tokens whose probability mass reaches top_p
+                sorted_logits, sorted_idx = torch.sort(logits, dim=-1, descending=True)
+                sorted_probs = F.softmax(sorted_logits, dim=-1)
+                # a token is dropped when the tokens ranked above it already cover top_p, so the first always stays
+                drop = torch.cumsum(sorted_probs, dim=-1) - sorted_probs >= top_p
+                sorted_logits = sorted_logits.masked_fill(drop, float('-inf'))
+                logits = torch.full_like(logits, float('-inf')).scatter(-1, sorted_idx, sorted_logits)
+            probs = F.softmax(logits, dim=-1)
+        self.cdf = torch.cumsum(probs, dim=-1) # (V, V), every row ends at ~1
+        self.cdf[:, -1] = 1.0 # rounding must not leave a gap above the last entry
+
+    def next(self, last):
+        # last is the (B,) current tokens, returns the (B,) next ones
+        u = torch.rand(last.shape[0], 1, dtype=self.cdf.dtype, device=self.cdf.device)
+        return torch.searchsorted(self.cdf[last], u, right=True)[:, 0].clamp(max=self.cdf.shape[1] - 1)
+
+    def generate_stream(self, idx, max_new_tokens):
+        # idx is (B, T) array of indices in the current context, only its last column matters
+        # yields every (B, 1) batch of sampled indices as soon as it is sampled
+        last = idx[:, -1].to(self.cdf.device)
+        for _ in range(max_new_tokens):
+            last = self.next(last)
+            yield last[:, None]
+
 # super simple bigram model
 class BigramLanguageModel(nn.Module):
 
@@ -79,43 +152,54 @@ class BigramLanguageModel(nn.Module):
 
         return logits, loss
 
-    def generate(self, idx, max_new_tokens):
+    @torch.no_grad()
+    def generate_stream(self, idx, max_new_tokens, temperature=1.0, top_k=None, top_p=None):
         # idx is (B, T) array of indices in the current context
-        for _ in range(max_new_tokens):
-            # get the predictions
-            logits, loss = self(idx)
-            # focus only on the last time step
-            logits = logits[:, -1, :] # becomes (B, C)
-            # apply softmax to get probabilities
-            probs = F.softmax(logits, dim=-1) # (B, C)
-            # sample from the distribution
-            idx_next = torch.multinomial(probs, num_samples=1) # (B, 1)
-            # append sampled index to the running sequence
-            idx = torch.cat((idx, idx_next), dim=1) # (B, T+1)
-        return idx
-
-model = BigramLanguageModel(vocab_size)
-m = model.to(device)
-
-# create a PyTorch optimizer
-optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
-
-for iter in range(max_iters):
-
-    # every once in a while evaluate the loss on train and val sets
-    if iter % eval_interval == 0:
-        losses = estimate_loss()
-        print(f"step {iter}: train loss {losses['train']:.4f}, val loss {losses['val']:.4f}")
-
-    # sample a batch of data
-    xb, yb = get_batch('train')
-
-    # evaluate the loss
-    logits, loss = model(xb, yb)
-    optimizer.zero_grad(set_to_none=True)
-    loss.backward()
-    optimizer.step()
-
-# generate from the model
-context = torch.zeros((1, 1), dtype=torch.long, device=device)
-print(decode(m.generate(context, max_new_tokens=500)[0].tolist()))
\ No newline at end of file
+        # yields every (B, 1) batch of sampled indices as soon as it is sampled
+        # the next token only depends on the last one, so the whole table is the model:
+        # every step is a lookup in its precomputed distributions, however long the sequence already is
+        sampler = BigramSampler(self.token_embedding_table.weight, temperature, top_k, top_p)
+        yield from sampler.generate_stream(idx, max_new_tokens)
+
+    def generate(self, idx, max_new_tokens, temperature=1.0, top_k=None, top_p=None):
+        # idx is (B, T) array of indices in the current context
+        # the samples are concatenated once at the end instead of growing idx every step
+        new = list(self.generate_stream(idx, max_new_tokens, temperature, top_k, top_p))
+        return torch.cat([idx] + new, dim=1) # (B, T+max_new_tokens)
+
+if __name__ == '__main__':
+    model = BigramLanguageModel(vocab_size)
+    m = model.to(device)
+
+    if fit == 'count':
+        # the table gradient descent converges to is the log of the bigram frequencies, so read it off directly
+        with torch.no_grad():
+            model.token_embedding_table.weight.copy_(bigram_log_probs(count_bigrams('train'), smoothing))
+        log_probs = F.log_softmax(model.token_embedding_table.weight.detach(), dim=-1)
+        print(f"counted: train loss {counted_loss(log_probs, 'train'):.4f}, val loss {counted_loss(log_probs, 'val'):.4f}")
+    else:
+        # create a PyTorch optimizer
+        optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
+
+        for iter in range(max_iters):
+
+            # every once in a while evaluate the loss on train and val sets
+            if iter % eval_interval == 0:
+                losses = estimate_loss()
+                print(f"step {iter}: train loss {losses['train']:.4f}, val loss {losses['val']:.4f}")
+
+            # sample a batch of data
+            xb, yb = get_batch('train')
+
+            # evaluate the loss
+            logits, loss = model(xb, yb)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+
+    # generate from the model, printing every character as soon as it is sampled
+    sampler = BigramSampler(m.token_embedding_table.weight)
+    context = torch.zeros((1, 1), dtype=torch.long, device=device)
+    for idx_next in sampler.generate_stream(context, max_new_tokens=500):
+        print(decode(idx_next[0].tolist()), end='', flush=True)
+    print()
\ No newline at end of file
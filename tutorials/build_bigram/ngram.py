@@ -0,0 +1,158 @@
+import json
+import math
+import time
+
+import numpy as np
+
+# n-gram baselines for the GPT: counts of every k-gram (k = 1..n) of the encoded corpus, kept as
+# sorted int64 keys (the k token ids as one base-V number) with their counts, looked up by binary search
+#
+#   python ngram.py    # memory / latency / val loss for n = 2..6, needs `python ../build_gpt/prepare.py wizard_of_oz.txt`
+
+# hyperparameters
+orders = [2, 3, 4, 5, 6]
+smoothings = ['kneser_ney', 'stupid_backoff']
+chunk_size = 1 << 22 # tokens per chunk while counting and scoring, keeps memory flat on large corpora
+# ------------
+
+def gram_keys(data, k, vocab_size):
+    # int64 key of every length-k window of data, the first token is the most significant digit
+    n = len(data) - k + 1
+    keys = np.zeros(max(n, 0), dtype=np.int64)
+    for j in range(k):
+        keys = keys * vocab_size + data[j:j+n]
+    return keys
+
+def gram_keys_rows(grams, vocab_size):
+    # int64 key of every row of a (B, k) array
+    keys = np.zeros(len(grams), dtype=np.int64)
+    for j in range(grams.shape[1]):
+        keys = keys * vocab_size + grams[:, j]
+    return keys
+
+def merge_counts(keys, counts):
+    # sum the counts of equal keys, the result is sorted by key
+    order = np.argsort(keys, kind='stable')
+    keys, counts = keys[order], counts[order]
+    uniq, start = np.unique(keys, return_index=True)
+    return uniq, np.add.reduceat(counts, start) if len(keys) else counts
+
+def lookup(table_keys, table_values, query):
+    # table_values of the query keys, 0 where a key isn't in the table
+    if len(table_keys) == 0:
+        return np.zeros(len(query), dtype=table_values.dtype)
+    pos = np.minimum(np.searchsorted(table_keys, query), len(table_keys) - 1)
+    return np.where(table_keys[pos] == query, table_values[pos], 0)
+
+class NGramIndex:
+    """ sorted keys and counts of every k-gram, k = 1..n, of a token array (e.g. a memmapped train.bin) """
+
+    def __init__(self, data, n, vocab_size):
+        assert vocab_size ** n < 2**63, f'{n}-grams over {vocab_size} tokens do not fit in an int64 key'
+        self.n = n
+        self.vocab_size = vocab_size
+        self.keys = {}
+        self.counts = {}
+        for k in range(1, n + 1):
+            parts_keys, parts_counts = [], []
+            for i in range(0, len(data) - k + 1, chunk_size):
+                # k - 1 tokens of overlap, so the windows across the chunk boundary are counted once
+                chunk = np.asarray(data[i:i+chunk_size+k-1], dtype=np.int64)
+                uniq, counts = np.unique(gram_keys(chunk, k, vocab_size), return_counts=True)
+                parts_keys.append(uniq)
+                parts_counts.append(counts)
+            self.keys[k], self.counts[k] = merge_counts(np.concatenate(parts_keys), np.concatenate(parts_counts))
+
+    def nbytes(self):
+        return sum(self.keys[k].nbytes + self.counts[k].nbytes for k in self.keys)
+
+class NGramLanguageModel:
+    """ P(next token | the n - 1 before it) from an NGramIndex, with interpolated Kneser-Ney or stupid backoff """
+
+    def __init__(self, index, smoothing='kneser_ney', backoff=0.4):
+        self.index = index
+        self.n = index.n
+        self.vocab_size = index.vocab_size
+        self.smoothing = smoothing
+        self.backoff = backoff # stupid backoff's penalty per order backed off
+        # per order k: (gram keys, their counts, context keys, context totals, distinct continuations, discount)
+        self.tables = {}
+        for k in range(1, self.n + 1):
+            keys, counts = index.keys[k], index.counts[k]
+            if smoothing == 'kneser_ney' and k < self.n:
+                # lower orders count in how many distinct contexts a gram follows, not how often it occurs
+                keys, counts = np.unique(index.keys[k + 1] % self.vocab_size ** k, return_counts=True)
+            # the keys are sorted, so are their contexts (all but the last token), and equal contexts are adjacent
+            contexts, start, types = np.unique(keys // self.vocab_size, return_index=True, return_counts=True)
+            totals = np.add.reduceat(counts, start)
+            n1, n2 = (counts == 1).sum(), (counts == 2).sum()
+            discount = n1 / (n1 + 2 * n2) if n1 + n2 > 0 else 0.75
+            self.tables[k] = (keys, counts, contexts, totals, types, discount)
+
+    def nbytes(self):
+        total = self.index.nbytes()
+        for k, (keys, counts, contexts, totals, types, discount) in self.tables.items():
+            total += contexts.nbytes + totals.nbytes + types.nbytes
+            if keys is not self.index.keys[k]:
+                total += keys.nbytes + counts.nbytes # kneser-ney's continuation counts
+        return total
+
+    def log_probs(self, grams):
+        # grams is a (B, n) array of the n - 1 context tokens followed by the target, returns the (B,) log-probs
+        # stupid backoff scores are not normalized, so for it this is only a log-score
+        grams = np.asarray(grams, dtype=np.int64)
+        keys = {k: gram_keys_rows(grams[:, self.n-k:], self.vocab_size) for k in range(1, self.n + 1)}
+        if self.smoothing == 'kneser_ney':
+            # from the uniform distribution up: discounted counts plus the held back mass times the order below
+            p = np.full(len(grams), 1.0 / self.vocab_size)
+            for k in range(1, self.n + 1):
+                table_keys, counts, contexts, totals, types, discount = self.tables[k]
+                c = lookup(table_keys, counts, keys[k])
+                h = keys[k] // self.vocab_size
+                total = lookup(contexts, totals, h)
+                n_types = lookup(contexts, types, h)
+                interpolated = (np.maximum(c - discount, 0) + discount * n_types * p) / np.maximum(total, 1)
+                p = np.where(total > 0, interpolated, p) # an unseen context defers to the order below
+            return np.log(p)
+        # stupid backoff: the relative frequency of the longest gram that was seen, times backoff per order dropped
+        table_keys, counts, contexts, totals, types, discount = self.tables[1]
+        n_tokens = totals.sum()
+        # add-one unigrams so that even an unseen token scores above 0
+        score = self.backoff ** (self.n - 1) * (lookup(table_keys, counts, keys[1]) + 1) / (n_tokens + self.vocab_size)
+        for k in range(2, self.n + 1):
+            table_keys, counts, contexts, totals, types, discount = self.tables[k]
+            c = lookup(table_keys, counts, keys[k])
+            total = lookup(contexts, totals, keys[k] // self.vocab_size)
+            score = np.where(c > 0, self.backoff ** (self.n - k) * c / np.maximum(total, 1), score)
+        return np.log(score)
+
+    def log_likelihood(self, data):
+        # mean negative log-likelihood (nats per token) of every token of data with a full n - 1 context
+        total, count = 0.0, 0
+        for i in range(0, len(data) - self.n + 1, chunk_size):
+            chunk = np.asarray(data[i:i+chunk_size+self.n-1], dtype=np.int64)
+            windows = np.lib.stride_tricks.sliding_window_view(chunk, self.n) # (B, n) without copying
+            total -= self.log_probs(windows).sum()
+            count += len(windows)
+        return total / count
+
+if __name__ == '__main__':
+    with open('meta.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    vocab_size = len(meta['chars']) + len(meta.get('merges', []))
+    train_data = np.memmap('train.bin', dtype=np.dtype(meta['dtype']), mode='r')
+    val_data = np.memmap('val.bin', dtype=np.dtype(meta['dtype']), mode='r')
+    print(f"train {len(train_data):,} tokens, val {len(val_data):,} tokens, vocab size {vocab_size}")
+    print(f"{'n':<4}{'smoothing':<16}{'build s':>9}{'index MB':>10}{'us/token':>10}{'val loss':>10}{'bits/token':>12}")
+    for n in orders:
+        t0 = time.perf_counter()
+        index = NGramIndex(train_data, n, vocab_size)
+        index_time = time.perf_counter() - t0
+        for smoothing in smoothings:
+            t0 = time.perf_counter()
+            model = NGramLanguageModel(index, smoothing)
+            build_time = index_time + time.perf_counter() - t0
+            t0 = time.perf_counter()
+            loss = model.log_likelihood(val_data)
+            us_per_token = (time.perf_counter() - t0) * 1e6 / (len(val_data) - n + 1)
+            print(f"{n:<4}{smoothing:<16}{build_time:>9.2f}{model.nbytes() / 2**20:>10.1f}{us_per_token:>10.2f}{loss:>10.4f}{loss / math.log(2):>12.3f}")
@@ -0,0 +1,85 @@
+import time
+
+import torch
+import torch.nn as nn
+from torch.nn import functional as F
+
+from gpt import TrainConfig
+from model import GPTConfig, MultiHeadAttention
+
+# forward/backward latency of the fused attention against the old one-module-per-head layout,
+# at the hyperparameters of gpt.py
+n_repeats = 10
+config = GPTConfig()
+block_size, n_embd, n_head = config.block_size, config.n_embd, config.n_head
+batch_size, device = TrainConfig.batch_size, TrainConfig.device
+# ------------
+
+class Head(nn.Module):
+    """ one head of self-attention, the layout gpt.py used before the fused qkv projection """
+
+    def __init__(self, head_size):
+        super().__init__()
+        self.key = nn.Linear(n_embd, head_size, bias=False)
+        self.query = nn.Linear(n_embd, head_size, bias=False)
+        self.value = nn.Linear(n_embd, head_size, bias=False)
+        self.register_buffer('tril', torch.tril(torch.ones(block_size, block_size)))
+
+    def forward(self, x):
+        B,T,C = x.shape
+        k = self.key(x)
+        q = self.query(x)
+        wei = q @ k.transpose(-2,-1) * k.shape[-1]**-0.5
+        wei = wei.masked_fill(self.tril[:T, :T] == 0, float('-inf'))
+        wei = F.softmax(wei, dim=-1)
+        v = self.value(x)
+        return wei @ v
+
+class PerHeadAttention(nn.Module):
+
+    def __init__(self, num_heads, head_size):
+        super().__init__()
+        self.heads = nn.ModuleList([Head(head_size) for _ in range(num_heads)])
+        self.proj = nn.Linear(head_size * num_heads, n_embd)
+
+    def forward(self, x):
+        return self.proj(torch.cat([h(x) for h in self.heads], dim=-1))
+
+def bench(module, x):
+    # one warmup round, then the mean over n_repeats
+    fwd = bwd = 0.0
+    for i in range(n_repeats + 1):
+        t0 = time.perf_counter()
+        out = module(x)
+        t1 = time.perf_counter()
+        out.sum().backward()
+        t2 = time.perf_counter()
+        if i > 0:
+            fwd += t1 - t0
+            bwd += t2 - t1
+    return fwd / n_repeats * 1000, bwd / n_repeats * 1000
+
+torch.manual_seed(1337)
+head_size = n_embd // n_head
+legacy = PerHeadAttention(n_head, head_size).to(device)
+fused = MultiHeadAttention(config).to(device)
+fused.eval() # no dropout, so the outputs are comparable
+
+# a per-head state dict has to load into the fused module and give the same outputs
+fused.load_state_dict(legacy.state_dict())
+x = torch.randn(batch_size, block_size, n_embd, device=device, requires_grad=True)
+with torch.no_grad():
+    max_err = (legacy(x) - fused(x)).abs().max().item()
+print(f"max abs difference per-head vs. fused: {max_err:.2e}")
+assert max_err < 1e-4, 'fused attention does not match the per-head layout'
+
+print(f"B={batch_size} T={block_size} C={n_embd} heads={n_head}")
+print(f"{'attention':<22}{'forward ms':>12}{'backward ms':>13}")
+results = [('per-head ModuleList', bench(legacy, x))]
+fused.flash = False
+results.append(('fused, masked softmax', bench(fused, x)))
+if hasattr(F, 'scaled_dot_product_attention'):
+    fused.flash = True
+    results.append(('fused, sdpa', bench(fused, x)))
+for name, (fwd, bwd) in results:
+    print(f"{name:<22}{fwd:>12.2f}{bwd:>13.2f}")
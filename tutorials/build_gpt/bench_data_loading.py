@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import torch
+
+from data import BatchPrefetcher, CharDataset
+from gpt import TrainConfig
+from model import GPTConfig, GPTLanguageModel
+
+# fraction of the training step spent waiting for data, for the old per-window batch
+# assembly, the vectorized get_batch, and the vectorized get_batch on a prefetch thread
+n_steps = 20
+config = TrainConfig()
+dataset = CharDataset(config.data_dir)
+model_config = GPTConfig(vocab_size=dataset.vocab_size)
+batch_size, block_size, device = config.batch_size, model_config.block_size, config.device
+# ------------
+
+def get_batch_per_window(split):
+    # the batch assembly gpt.py used before: one slice per row, then two stacks
+    data = dataset.memmap(split)
+    ix = torch.randint(len(data) - block_size, (batch_size,))
+    x = torch.stack([torch.from_numpy(data[i:i+block_size].astype(np.int64)) for i in ix])
+    y = torch.stack([torch.from_numpy(data[i+1:i+block_size+1].astype(np.int64)) for i in ix])
+    return x.to(device), y.to(device)
+
+def run(next_batch):
+    data_time = step_time = 0.0
+    for _ in range(n_steps):
+        t0 = time.perf_counter()
+        xb, yb = next_batch()
+        t1 = time.perf_counter()
+        logits, loss = model(xb, yb)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+        data_time += t1 - t0
+        step_time += time.perf_counter() - t0
+    return data_time / n_steps * 1000, step_time / n_steps * 1000
+
+torch.manual_seed(1337)
+model = GPTLanguageModel(model_config).to(device)
+optimizer = torch.optim.AdamW(model.parameters(), lr=config.learning_rate)
+
+# a warmup round so allocator/thread pool setup isn't billed to the first variant
+run(lambda: dataset.get_batch('train', batch_size, block_size, device))
+
+prefetcher = BatchPrefetcher(dataset, 'train', batch_size, block_size, device, config.prefetch_depth)
+results = [
+    ('per-window slices', run(lambda: get_batch_per_window('train'))),
+    ('vectorized', run(lambda: dataset.get_batch('train', batch_size, block_size, device))),
+    ('vectorized + prefetch', run(prefetcher.next)),
+]
+print(f"{'get_batch':<24}{'data ms':>10}{'step ms':>10}{'data share':>12}")
+for name, (data_ms, step_ms) in results:
+    print(f"{name:<24}{data_ms:>10.2f}{step_ms:>10.2f}{100 * data_ms / step_ms:>11.1f}%")
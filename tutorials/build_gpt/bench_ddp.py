@@ -0,0 +1,59 @@
+import os
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+
+from data import CharDataset
+from gpt import TrainConfig
+from model import GPTConfig, GPTLanguageModel
+
+# data-parallel scaling on one box: steps/sec and tokens/sec of gpt.py's training step
+# for 1, 2, 4 and 8 gloo ranks, each with its own batch of batch_size sequences
+n_steps = 30
+n_warmup = 5
+world_sizes = [1, 2, 4, 8]
+config = TrainConfig()
+block_size = GPTConfig.block_size
+# ------------
+
+def worker(rank, world_size, port, results):
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group(backend=config.ddp_backend, rank=rank, world_size=world_size)
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    torch.manual_seed(1337 + rank)
+    dataset = CharDataset(config.data_dir)
+    model = DDP(GPTLanguageModel(GPTConfig(vocab_size=dataset.vocab_size)).to(config.device))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=config.learning_rate)
+    for i in range(n_warmup + n_steps):
+        if i == n_warmup:
+            dist.barrier()
+            t0 = time.perf_counter()
+        xb, yb = dataset.get_batch('train', config.batch_size, block_size, config.device)
+        logits, loss = model(xb, yb)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+    dist.barrier()
+    if rank == 0:
+        results.put(n_steps / (time.perf_counter() - t0))
+    dist.destroy_process_group()
+
+if __name__ == '__main__':
+    ctx = mp.get_context('spawn')
+    results = ctx.SimpleQueue()
+    print(f"B={config.batch_size} T={block_size} per rank, {os.cpu_count()} cores")
+    print(f"{'ranks':<8}{'steps/sec':>10}{'tokens/sec':>12}{'speedup':>9}")
+    base = None
+    for world_size in world_sizes:
+        if world_size > (os.cpu_count() or 1):
+            break
+        # a fresh port per run, the previous one may still be in TIME_WAIT
+        mp.spawn(worker, args=(world_size, 29500 + world_size, results), nprocs=world_size)
+        steps_per_sec = results.get()
+        tokens_per_sec = steps_per_sec * world_size * config.batch_size * block_size
+        base = base or tokens_per_sec
+        print(f"{world_size:<8}{steps_per_sec:>10.2f}{tokens_per_sec:>12.0f}{tokens_per_sec / base:>8.2f}x")
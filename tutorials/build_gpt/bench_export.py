@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import time
+
+import torch
+
+from checkpoint import load_pretrained
+from export import export
+from run_exported import generate_stream, load
+
+# eager GPTLanguageModel vs. the TorchScript decode step of export.py on the cpu: parity,
+# cold start of a fresh process up to the first generated token, and per-token latency
+checkpoint_dir = 'checkpoints'
+max_new_tokens = 500
+n_runs = 3
+# ------------
+
+artifact = export(checkpoint_dir, os.path.join(checkpoint_dir, 'model.ts'))
+model, _ = load_pretrained(checkpoint_dir, 'cpu')
+step, config, tokenizer = load(artifact)
+context = torch.zeros((1, 1), dtype=torch.long)
+
+# greedy tokens of both, past block_size where both recompute the window
+with torch.no_grad():
+    eager = model.generate(context, config['block_size'] + 50, temperature=0)[0, 1:]
+exported = torch.cat(list(generate_stream(step, config, context, config['block_size'] + 50, temperature=0)), dim=1)[0]
+print(f"greedy tokens matching eager: {(eager == exported).float().mean().item()*100:.1f}%")
+
+# a fresh interpreter each time, from the start of the process to the first token
+def cold_start(cmd):
+    best = float('inf')
+    for _ in range(n_runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *cmd], check=True, capture_output=True)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+print(f"{'path':<12}{'cold start ms':>15}{'ms/token':>10}")
+runs = [
+    ('eager', ['sample.py', '--checkpoint_dir', checkpoint_dir, '--device', 'cpu', '--max_new_tokens', '1'],
+     lambda: model.generate(context, max_new_tokens)),
+    ('torchscript', ['run_exported.py', '--artifact', artifact, '--max_new_tokens', '1'],
+     lambda: list(generate_stream(step, config, context, max_new_tokens))),
+]
+for name, cmd, fn in runs:
+    start_ms = cold_start(cmd)
+    per_token = float('inf')
+    for _ in range(n_runs):
+        t0 = time.perf_counter()
+        fn()
+        per_token = min(per_token, (time.perf_counter() - t0) * 1000 / max_new_tokens)
+    print(f"{name:<12}{start_ms:>15.0f}{per_token:>10.2f}")
@@ -0,0 +1,58 @@
+import random
+import time
+
+import torch
+
+from checkpoint import load_pretrained
+from data import CharDataset
+from generation import beam_search, generate_many
+from gpt import TrainConfig
+
+# batched decoding of prompts of different lengths: parity with generate, then tokens/sec for 1, 16
+# and 128 prompts, one generate call per prompt vs. one left-padded batch vs. beam search
+prompt_counts = [1, 16, 128]
+max_new_tokens = 100
+num_beams = 4
+min_prompt_len, max_prompt_len = 8, 64
+# ------------
+
+device = TrainConfig.device
+model, tokenizer = load_pretrained(TrainConfig.checkpoint_dir, device)
+val = CharDataset(TrainConfig.data_dir).memmap('val')
+rng = random.Random(1337)
+
+def random_prompts(n):
+    # n slices of the val split of random lengths
+    prompts = []
+    for _ in range(n):
+        length = rng.randint(min_prompt_len, max_prompt_len)
+        start = rng.randrange(len(val) - length)
+        prompts.append([int(t) for t in val[start:start+length]])
+    return prompts
+
+def solo(prompt, **kwargs):
+    context = torch.tensor([prompt], dtype=torch.long, device=device)
+    return model.generate(context, max_new_tokens, **kwargs)[0, len(prompt):].tolist()
+
+# greedy rows of a left-padded batch against every prompt decoded on its own
+prompts = random_prompts(8)
+batched = generate_many(model, prompts, max_new_tokens, temperature=0)
+matching = sum(a == b for p, out in zip(prompts, batched) for a, b in zip(solo(p, temperature=0), out))
+print(f"greedy tokens of the padded batch matching unpadded generate: {100 * matching / (len(prompts) * max_new_tokens):.1f}%")
+(best, score), = beam_search(model, prompts[:1], max_new_tokens, num_beams=num_beams)
+print(f"beam search, {num_beams} beams: {tokenizer.decode(prompts[0])!r} -> {tokenizer.decode(best)!r} ({score:.3f} per token)")
+
+def tokens_per_sec(fn, n_tokens):
+    t0 = time.perf_counter()
+    fn()
+    return n_tokens / (time.perf_counter() - t0)
+
+print(f"\n{max_new_tokens} new tokens per prompt, prompts of {min_prompt_len}-{max_prompt_len} tokens, on {device}")
+print(f"{'prompts':>8}{'one by one':>12}{'batched':>12}{f'beam x{num_beams}':>12}   (tokens/sec)")
+for n in prompt_counts:
+    prompts = random_prompts(n)
+    n_tokens = n * max_new_tokens
+    one_by_one = tokens_per_sec(lambda: [solo(p) for p in prompts], n_tokens)
+    batched = tokens_per_sec(lambda: generate_many(model, prompts, max_new_tokens), n_tokens)
+    beams = tokens_per_sec(lambda: beam_search(model, prompts, max_new_tokens, num_beams=num_beams), n_tokens)
+    print(f"{n:>8}{one_by_one:>12.1f}{batched:>12.1f}{beams:>12.1f}")
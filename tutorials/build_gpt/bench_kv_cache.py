@@ -0,0 +1,48 @@
+import time
+
+import torch
+
+from model import GPTConfig, GPTLanguageModel
+
+# parity of the kv cached decoding path against the plain forward pass, then tokens/sec
+# for both generate paths (untrained weights, the cost doesn't depend on the values)
+max_new_tokens = 500
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+# ------------
+
+torch.manual_seed(1337)
+config = GPTConfig()
+block_size = config.block_size
+model = GPTLanguageModel(config).to(device)
+model.eval()
+
+# logits of a full forward pass vs. prompt + one token at a time through the cache
+with torch.no_grad():
+    idx = torch.randint(model.lm_head.out_features, (2, block_size), device=device)
+    ref, _ = model(idx)
+    model.reset_cache()
+    prompt_len = 8
+    logits, _ = model(idx[:, :prompt_len], use_cache=True)
+    steps = [logits]
+    for t in range(prompt_len, block_size):
+        logits, _ = model(idx[:, t:t+1], use_cache=True)
+        steps.append(logits)
+    model.reset_cache()
+    cached = torch.cat(steps, dim=1)
+max_err = (ref - cached).abs().max().item()
+print(f"max abs logit difference cached vs. uncached: {max_err:.2e}")
+assert torch.allclose(ref, cached, atol=1e-4), 'kv cache is out of sync with the full forward pass'
+
+# same seed -> same samples, also past block_size where the window slides
+context = torch.zeros((1, 1), dtype=torch.long, device=device)
+torch.manual_seed(0)
+out_plain = model.generate(context, max_new_tokens=block_size + 20, use_cache=False)
+torch.manual_seed(0)
+out_cached = model.generate(context, max_new_tokens=block_size + 20, use_cache=True)
+print(f"sampled tokens matching: {(out_plain == out_cached).float().mean().item()*100:.1f}%")
+
+for use_cache in (False, True):
+    t0 = time.perf_counter()
+    model.generate(context, max_new_tokens=max_new_tokens, use_cache=use_cache)
+    dt = time.perf_counter() - t0
+    print(f"use_cache={use_cache}: {max_new_tokens/dt:.1f} tokens/sec ({dt:.2f}s for {max_new_tokens} tokens)")
@@ -0,0 +1,57 @@
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+import torch.multiprocessing as mp
+
+from data import CharDataset
+from gpt import TrainConfig
+from model import GPTConfig, GPTLanguageModel
+
+# peak memory vs. step time of one optimizer step over the full batch_size, for every
+# gradient accumulation / activation checkpointing combination, each in a fresh process
+n_steps = 10
+n_warmup = 2
+accumulation_steps = [1, 2, 4, 8]
+config = TrainConfig()
+model_config = GPTConfig()
+# ------------
+
+def trial(gradient_accumulation_steps, activation_checkpointing):
+    torch.manual_seed(1337)
+    dataset = CharDataset(config.data_dir)
+    model = GPTLanguageModel(GPTConfig(vocab_size=dataset.vocab_size)).to(config.device)
+    model.activation_checkpointing = activation_checkpointing
+    optimizer = torch.optim.AdamW(model.parameters(), lr=config.learning_rate)
+    micro_batch_size = config.batch_size // gradient_accumulation_steps
+    # the weights, gradients and optimizer state are there in every combination: gradients and the
+    # AdamW moments are only allocated by the first step, so one on zero gradients allocates them
+    # before the baseline (it changes nothing but a tiny weight decay), leaving the activations on top
+    for p in model.parameters():
+        p.grad = torch.zeros_like(p)
+    optimizer.step()
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kB on linux
+    step_times = []
+    for _ in range(n_warmup + n_steps):
+        t0 = time.perf_counter()
+        optimizer.zero_grad(set_to_none=True)
+        for _ in range(gradient_accumulation_steps):
+            xb, yb = dataset.get_batch('train', micro_batch_size, model_config.block_size, config.device)
+            logits, loss = model(xb, yb)
+            (loss / gradient_accumulation_steps).backward()
+        optimizer.step()
+        step_times.append(time.perf_counter() - t0)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return statistics.median(step_times[n_warmup:]) * 1000, base_rss, peak_rss
+
+if __name__ == '__main__':
+    print(f"effective batch B={config.batch_size} T={model_config.block_size}, n_embd={model_config.n_embd} n_layer={model_config.n_layer}")
+    print(f"{'accum':>6}{'micro B':>9}{'ckpt':>6}{'step ms':>10}{'peak RSS MB':>13}{'activations MB':>15}")
+    for activation_checkpointing in (False, True):
+        for steps in accumulation_steps:
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+                step_ms, base_rss, peak_rss = pool.submit(trial, steps, activation_checkpointing).result()
+            ckpt = 'on' if activation_checkpointing else 'off'
+            print(f"{steps:>6}{config.batch_size // steps:>9}{ckpt:>6}{step_ms:>10.1f}{peak_rss:>13.0f}{peak_rss - base_rss:>15.0f}")
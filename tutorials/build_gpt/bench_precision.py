@@ -0,0 +1,54 @@
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+import torch.multiprocessing as mp
+
+from data import CharDataset
+from gpt import TrainConfig, autocast_context, evaluate, maybe_compile, resolve_dtype
+from model import GPTConfig, GPTLanguageModel
+
+# step time, peak RSS and validation loss after a short run for eager/compile x fp32/bf16,
+# each combination in a fresh process so the peak RSS is its own
+n_steps = 100
+n_warmup = 10 # steps left out of the timing, they include compilation
+eval_windows = 256
+# ------------
+
+config = TrainConfig()
+model_config = GPTConfig()
+
+def trial(dtype, compile_model):
+    torch.manual_seed(1337)
+    dtype = resolve_dtype(dtype, torch.device(config.device).type)
+    dataset = CharDataset(config.data_dir)
+    model = GPTLanguageModel(GPTConfig(vocab_size=dataset.vocab_size)).to(config.device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=config.learning_rate)
+    next_batch = lambda: dataset.get_batch('train', config.batch_size, model_config.block_size, config.device)
+    train_model = maybe_compile(model, *next_batch(), dtype) if compile_model else model
+    step_times = []
+    for _ in range(n_steps):
+        xb, yb = next_batch()
+        t0 = time.perf_counter()
+        with autocast_context(dtype, xb.device.type):
+            logits, loss = train_model(xb, yb)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+        step_times.append(time.perf_counter() - t0)
+    eval_set = {'val': dataset.eval_windows('val', eval_windows, model_config.block_size)}
+    val_loss = evaluate(model, eval_set, config.eval_batch_size, dtype)['val']
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kB on linux
+    return statistics.median(step_times[n_warmup:]) * 1000, peak_rss, val_loss
+
+if __name__ == '__main__':
+    print(f"{n_steps} steps of B={config.batch_size} T={model_config.block_size} on {config.device}")
+    print(f"{'mode':<10}{'dtype':<10}{'step ms':>10}{'peak RSS MB':>13}{'val loss':>10}")
+    for compile_model in (False, True):
+        for dtype in ('float32', 'bfloat16'):
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+                step_ms, peak_rss, val_loss = pool.submit(trial, dtype, compile_model).result()
+            mode = 'compile' if compile_model else 'eager'
+            print(f"{mode:<10}{dtype:<10}{step_ms:>10.1f}{peak_rss:>13.0f}{val_loss:>10.4f}")
@@ -0,0 +1,66 @@
+import dataclasses
+import time
+
+import numpy as np
+import torch
+
+from data import CharDataset
+from gpt import TrainConfig, train
+from model import GPTConfig, GPTLanguageModel
+
+# learned position embeddings vs. rotary embeddings: parity of the rolling kv window, then two
+# small models trained the same way, compared on val loss and decoding speed past block_size
+context_multiples = [1, 2, 4] # evaluated context lengths, in units of block_size
+n_windows = 64
+max_new_tokens = 1024
+config = TrainConfig(max_iters=1000, eval_interval=250, eval_windows=512, checkpoint_dir='', sample_tokens=0)
+model_config = GPTConfig(n_layer=4, n_embd=256, n_head=4, block_size=128)
+# ------------
+
+dataset = CharDataset(config.data_dir)
+block_size = model_config.block_size
+device = config.device
+
+@torch.inference_mode()
+def long_context_loss(model, windows):
+    # mean val loss over windows (n, L+1) longer than block_size. rope reads each window in one
+    # pass, every position attending to its block_size latest tokens; the learned table only has
+    # block_size positions, so the window is cut into independent block_size chunks
+    model.eval()
+    batch = torch.from_numpy(windows.astype(np.int64)).to(device)
+    x, y = batch[:, :-1], batch[:, 1:]
+    if model.config.position_encoding == 'rope':
+        return model(x.contiguous(), y.contiguous())[1].item()
+    losses = [model(x[:, i:i+block_size].contiguous(), y[:, i:i+block_size].contiguous())[1].item()
+              for i in range(0, x.shape[1], block_size)]
+    return sum(losses) / len(losses)
+
+# the rolling window must give the same logits as recomputing the cropped window from scratch
+torch.manual_seed(1337)
+rope_config = dataclasses.replace(model_config, vocab_size=dataset.vocab_size, position_encoding='rope')
+model = GPTLanguageModel(rope_config).to(device).eval()
+with torch.no_grad():
+    idx = torch.randint(dataset.vocab_size, (2, 3 * block_size), device=device)
+    model.reset_cache()
+    model(idx[:, :8], use_cache=True)
+    max_err = 0.0
+    for t in range(8, idx.shape[1]):
+        cached, _ = model(idx[:, t:t+1], use_cache=True)
+        # a fresh window restarts at position 0, rotary attention only sees the offsets
+        ref, _ = model(idx[:, max(0, t + 1 - block_size):t+1])
+        max_err = max(max_err, (cached[:, -1] - ref[:, -1]).abs().max().item())
+    model.reset_cache()
+print(f"max abs logit difference rolling kv window vs. recomputed window: {max_err:.2e}")
+assert max_err < 1e-3, 'rolling kv window is out of sync with the recomputed window'
+
+print(f"\n{config.max_iters} steps of B={config.batch_size} T={block_size} per model")
+header = ''.join(f"{f'val@{k}T':>10}" for k in context_multiples)
+print(f"{'positions':<10}{header}{'tokens/sec':>12}")
+for position_encoding in ('learned', 'rope'):
+    m, history = train(dataclasses.replace(model_config, position_encoding=position_encoding), config, dataset)
+    losses = [long_context_loss(m, dataset.eval_windows('val', n_windows, k * block_size)) for k in context_multiples]
+    context = torch.zeros((1, 1), dtype=torch.long, device=device)
+    t0 = time.perf_counter()
+    m.generate(context, max_new_tokens=max_new_tokens) # past block_size: recompute vs. rolling window
+    tps = max_new_tokens / (time.perf_counter() - t0)
+    print(f"{position_encoding:<10}{''.join(f'{l:>10.4f}' for l in losses)}{tps:>12.1f}")
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from data import CharDataset
+from gpt import TrainConfig
+from model import GPTConfig, GPTLanguageModel
+from serve import BatchingEngine, make_server
+
+# load generator for serve.py: many concurrent clients against continuous batching,
+# the same load against an engine that serves one request at a time, and as the floor
+# without any serving overhead, the requests one after another through the cached model.generate
+n_requests = 64
+concurrency = 16 # clients with a request in flight at any time
+max_new_tokens = 50
+prompt = 'Dorothy lived in the midst of the great Kansas prairies'
+# ------------
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def run(max_batch_size):
+    engine = BatchingEngine(model, max_batch_size=max_batch_size)
+    server = make_server(engine, dataset, port=0) # any free port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/generate"
+    body = json.dumps({'prompt': prompt, 'max_new_tokens': max_new_tokens}).encode('utf-8')
+
+    def one_request(_):
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(urllib.request.Request(url, data=body)) as response:
+            json.loads(response.read())
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_request, range(n_requests)))
+    elapsed = time.perf_counter() - t0
+    server.shutdown()
+    return percentile(latencies, 50), percentile(latencies, 99), n_requests * max_new_tokens / elapsed
+
+def run_generate():
+    # the latency of one request is one generate call, they don't wait for each other
+    context = torch.tensor([dataset.encode(prompt)], dtype=torch.long, device=model.device)
+    latencies = []
+    t0 = time.perf_counter()
+    for _ in range(n_requests):
+        t1 = time.perf_counter()
+        model.generate(context, max_new_tokens)
+        latencies.append(time.perf_counter() - t1)
+    elapsed = time.perf_counter() - t0
+    return percentile(latencies, 50), percentile(latencies, 99), n_requests * max_new_tokens / elapsed
+
+torch.manual_seed(1337)
+dataset = CharDataset(TrainConfig.data_dir)
+model = GPTLanguageModel(GPTConfig(vocab_size=dataset.vocab_size)).to(TrainConfig.device) # untrained, the cost doesn't depend on the weights
+model.eval()
+
+print(f"{n_requests} requests, {concurrency} concurrent clients, {max_new_tokens} new tokens each")
+print(f"{'serving':<22}{'p50 s':>8}{'p99 s':>8}{'tokens/sec':>12}")
+for name, max_batch_size in (('sequential', 1), ('continuous batching', concurrency)):
+    p50, p99, tps = run(max_batch_size)
+    print(f"{name:<22}{p50:>8.2f}{p99:>8.2f}{tps:>12.1f}")
+p50, p99, tps = run_generate()
+print(f"{'model.generate':<22}{p50:>8.2f}{p99:>8.2f}{tps:>12.1f}")
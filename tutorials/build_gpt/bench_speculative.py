@@ -0,0 +1,60 @@
+import dataclasses
+import time
+
+import numpy as np
+import torch
+from torch.nn import functional as F
+
+from checkpoint import load_pretrained
+from data import CharDataset
+from gpt import TrainConfig, train
+from model import GPTConfig
+from speculative import BigramDraft, speculative_generate
+
+# speculative decoding on the cpu: acceptance rate and speedup over plain cached decoding of the
+# checkpoint written by gpt.py, with a counted bigram and a tiny GPT as the draft, for several k
+ks = [1, 2, 4, 8]
+n_runs = 3
+draft_config = GPTConfig(n_layer=1, n_head=2, n_embd=64, dropout=0.0)
+draft_train = TrainConfig(max_iters=2000, eval_interval=500, eval_windows=256, checkpoint_dir='', sample_tokens=0, device='cpu')
+# ------------
+
+torch.set_grad_enabled(False)
+model, _ = load_pretrained(TrainConfig.checkpoint_dir, 'cpu')
+dataset = CharDataset(TrainConfig.data_dir)
+block_size = model.config.block_size
+max_new_tokens = block_size - 1
+context = torch.zeros((1, 1), dtype=torch.long)
+
+# bigram draft: log frequencies of the train split's bigrams, add-one smoothed
+train_data = dataset.memmap('train').astype(np.int64)
+V = dataset.vocab_size
+counts = torch.from_numpy(np.bincount(train_data[:-1] * V + train_data[1:], minlength=V * V).reshape(V, V))
+bigram = BigramDraft(F.log_softmax((counts + 1).double().log(), dim=-1))
+with torch.enable_grad():
+    tiny, _ = train(dataclasses.replace(draft_config, block_size=block_size), draft_train, dataset)
+tiny.eval()
+
+# greedy decoding is deterministic, so the speculative output has to match plain decoding token for token
+plain = model.generate(context, max_new_tokens, temperature=0)
+for draft in (bigram, tiny):
+    out, _ = speculative_generate(model, draft, context, max_new_tokens, k=4, temperature=0)
+    assert torch.equal(out, plain), 'speculative decoding changed the greedy output'
+
+def tokens_per_sec(fn):
+    best = 0.0
+    for seed in range(n_runs):
+        torch.manual_seed(seed)
+        t0 = time.perf_counter()
+        stats = fn()
+        best = max(best, max_new_tokens / (time.perf_counter() - t0))
+    return best, stats
+
+base, _ = tokens_per_sec(lambda: model.generate(context, max_new_tokens))
+print(f"{max_new_tokens} tokens, plain cached decoding {base:.1f} tokens/sec")
+print(f"{'draft':<8}{'k':>4}{'accepted':>10}{'tokens/pass':>13}{'tokens/sec':>12}{'speedup':>9}")
+for name, draft in (('bigram', bigram), ('tiny', tiny)):
+    for k in ks:
+        tps, (_, stats) = tokens_per_sec(lambda: speculative_generate(model, draft, context, max_new_tokens, k=k))
+        per_pass = max_new_tokens / stats['target_passes']
+        print(f"{name:<8}{k:>4}{100 * stats['acceptance_rate']:>9.1f}%{per_pass:>13.2f}{tps:>12.1f}{tps / base:>8.2f}x")
@@ -0,0 +1,57 @@
+import dataclasses
+import math
+import tempfile
+import time
+
+from data import CharDataset
+from gpt import TrainConfig, train
+from model import GPTConfig
+from prepare import prepare
+from tokenizer import BPETokenizer
+
+# characters vs. byte-pair encoding: encode throughput, then validation loss per character
+# of two models trained with the same steps, batch and block_size, i.e. at equal compute
+n_repeats = 3
+bpe_vocab_size = 512
+input_path = 'wizard_of_oz.txt'
+config = TrainConfig(max_iters=1000, eval_interval=250, eval_windows=512, checkpoint_dir='', sample_tokens=0)
+model_config = GPTConfig(n_layer=4, n_embd=256, n_head=4)
+# ------------
+
+with open(input_path, 'r', encoding='utf-8') as f:
+    text = f.read()
+n_train = int(0.9 * len(text))
+chars = sorted(set(text))
+bpe = BPETokenizer.train(text[:n_train], bpe_vocab_size, chars=chars)
+
+def throughput(tokenizer):
+    best = float('inf')
+    for _ in range(n_repeats):
+        if hasattr(tokenizer._encode_word, 'cache_clear'):
+            tokenizer._encode_word.cache_clear() # every repeat starts cold
+        t0 = time.perf_counter()
+        ids = tokenizer.encode(text)
+        best = min(best, time.perf_counter() - t0)
+    assert tokenizer.decode(ids) == text
+    return len(text) / best, len(text) / len(ids)
+
+print(f"{len(text):,} characters, {len(bpe.merges)} merges")
+print(f"{'tokenizer':<16}{'chars/sec':>12}{'chars/token':>13}")
+for name, tokenizer in (('chars', BPETokenizer(chars)),
+                        ('bpe, no cache', BPETokenizer(chars, bpe.merges, cache_size=0)),
+                        ('bpe', BPETokenizer(chars, bpe.merges))):
+    chars_per_sec, chars_per_token = throughput(tokenizer)
+    print(f"{name:<16}{chars_per_sec:>12,.0f}{chars_per_token:>13.2f}")
+
+# same steps of the same model on both encodings, a token covers more text with bpe
+print(f"\n{config.max_iters} steps of B={config.batch_size} T={model_config.block_size} each")
+print(f"{'tokenizer':<12}{'vocab':>7}{'val loss/token':>16}{'val loss/char':>15}{'bits/char':>11}")
+for name, vocab_size in (('chars', 0), ('bpe', bpe_vocab_size)):
+    with tempfile.TemporaryDirectory() as data_dir:
+        prepare(input_path, vocab_size, out_dir=data_dir)
+        dataset = CharDataset(data_dir)
+        n_val_tokens = len(dataset.memmap('val'))
+        m, history = train(model_config, dataclasses.replace(config, data_dir=data_dir), dataset)
+    val_loss = history[-1][1]['val']
+    per_char = val_loss * n_val_tokens / (len(text) - n_train)
+    print(f"{name:<12}{m.config.vocab_size:>7}{val_loss:>16.4f}{per_char:>15.4f}{per_char / math.log(2):>11.3f}")
@@ -0,0 +1,78 @@
+import json
+import os
+from dataclasses import asdict
+
+import torch
+
+from model import GPTConfig, GPTLanguageModel, quantize_int8
+from tokenizer import BPETokenizer
+
+# the weights, the optimizer state and the training state are separate files, so an
+# inference process only reads config.json and memory-maps model.pt
+
+def _save(obj, directory, name):
+    # write to a temporary file first, a crash mid-save must not destroy the last good checkpoint
+    path = os.path.join(directory, name)
+    torch.save(obj, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def save_checkpoint(directory, iter, model, optimizer, chars, generator=None, merges=()):
+    os.makedirs(directory, exist_ok=True)
+    _save(model.state_dict(), directory, 'model.pt')
+    _save(optimizer.state_dict(), directory, 'optimizer.pt')
+    _save({
+        'iter': iter,
+        'rng': torch.get_rng_state(),
+        'cuda_rng': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+        'batch_rng': generator.get_state() if generator is not None else None,
+    }, directory, 'train_state.pt')
+    with open(os.path.join(directory, 'config.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump({**asdict(model.config), 'chars': chars, 'merges': list(merges)}, f, ensure_ascii=False)
+    os.replace(os.path.join(directory, 'config.json.tmp'), os.path.join(directory, 'config.json'))
+
+def load_config(directory):
+    # the model config and the tokenizer a checkpoint was trained with
+    with open(os.path.join(directory, 'config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    tokenizer = BPETokenizer(config.pop('chars'), config.pop('merges', []))
+    return GPTConfig(**config), tokenizer
+
+def load_weights(model, directory, assign=False):
+    # mmap: tensors are paged in from the file on first touch instead of being read up front,
+    # with assign the (cpu) model keeps using those pages instead of copying them into its own
+    # parameters, which an optimizer that already holds the old parameters can't follow
+    state_dict = torch.load(os.path.join(directory, 'model.pt'), map_location='cpu', mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=assign)
+    return model
+
+def save_int8(model, directory):
+    _save(model.state_dict(), directory, 'model_int8.pt')
+
+def load_pretrained(directory, device='cpu', int8=False):
+    # inference model from a checkpoint: returns the model in eval mode and the tokenizer it was trained with
+    # int8 loads the quantized weights written by quantize.py, on the cpu
+    config, tokenizer = load_config(directory)
+    model = GPTLanguageModel(config)
+    if int8:
+        model = quantize_int8(model)
+        # packed int8 weights aren't plain tensors, so this needs the full (trusted) unpickler
+        model.load_state_dict(torch.load(os.path.join(directory, 'model_int8.pt'), weights_only=False))
+        return model, tokenizer
+    load_weights(model, directory, assign=device == 'cpu')
+    model = model.to(device)
+    model.eval()
+    return model, tokenizer
+
+def load_checkpoint(directory, model, optimizer, device='cpu', generator=None, restore_rng=True):
+    # restores everything save_checkpoint wrote and returns the step to continue from
+    load_weights(model, directory)
+    optimizer.load_state_dict(torch.load(os.path.join(directory, 'optimizer.pt'), map_location=device, weights_only=True))
+    state = torch.load(os.path.join(directory, 'train_state.pt'), weights_only=True)
+    if not restore_rng:
+        return state['iter'] + 1
+    torch.set_rng_state(state['rng'])
+    if state['cuda_rng'] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda_rng'])
+    if state['batch_rng'] is not None and generator is not None:
+        generator.set_state(state['batch_rng'])
+    return state['iter'] + 1
@@ -0,0 +1,113 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+import torch
+
+from tokenizer import BPETokenizer
+
+class CharDataset:
+    """ the train/val splits written by prepare.py, memory-mapped, with the vocabulary from meta.json
+    (characters, plus the byte-pair merges when prepare.py ran with --bpe_vocab_size) """
+
+    def __init__(self, data_dir='.'):
+        # the corpus is encoded once by prepare.py (`python prepare.py wizard_of_oz.txt`),
+        # which writes train.bin, val.bin and the meta.json vocabulary next to the text
+        self.data_dir = data_dir
+        with open(os.path.join(data_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # here are all the unique characters that occur in this text
+        self.chars = meta['chars']
+        # without merges the tokenizer is exactly the character mapping above
+        self.tokenizer = BPETokenizer(self.chars, meta.get('merges', []))
+        self.merges = self.tokenizer.merges
+        self.vocab_size = self.tokenizer.vocab_size
+        # Train and test splits, memory-mapped so RAM stays flat regardless of corpus size
+        self.dtype = np.dtype(meta['dtype'])
+
+    def encode(self, s):
+        # encoder: take a string, output a list of integers
+        return self.tokenizer.encode(s)
+
+    def decode(self, l):
+        # decoder: take a list of integers, output a string
+        return self.tokenizer.decode(l)
+
+    def memmap(self, split):
+        # recreated for every batch so the pages it touched don't stay referenced
+        return np.memmap(os.path.join(self.data_dir, f'{split}.bin'), dtype=self.dtype, mode='r')
+
+    def get_batch(self, split, batch_size, block_size, device='cpu', generator=None):
+        # generate a small batch of data of inputs x and targets y
+        data = self.memmap(split)
+        ix = torch.randint(len(data) - block_size, (batch_size,), generator=generator)
+        # gather all windows in one indexing op, only they are read from disk and widened to int64
+        batch = torch.from_numpy(data[ix.numpy()[:, None] + np.arange(block_size + 1)].astype(np.int64)) # (B, T+1)
+        x = batch[:, :-1].contiguous()
+        y = batch[:, 1:].contiguous()
+        if device == 'cuda':
+            # page-locked host buffers let the copy run asynchronously
+            x, y = x.pin_memory().to(device, non_blocking=True), y.pin_memory().to(device, non_blocking=True)
+        else:
+            x, y = x.to(device), y.to(device)
+        return x, y
+
+    def eval_windows(self, split, n_windows, block_size, seed=1337):
+        # windows drawn from a fixed seed, so every evaluation (and the eval process) scores the same text
+        data = self.memmap(split)
+        generator = torch.Generator().manual_seed(seed)
+        ix = torch.randint(len(data) - block_size, (n_windows,), generator=generator)
+        return data[ix.numpy()[:, None] + np.arange(block_size + 1)] # (n_windows, T+1), still in the compact on-disk dtype
+
+class BatchPrefetcher:
+    """ samples batches of one split on a producer thread, so the next batch is ready when the step ends;
+    an error of the producer is re-raised by next(), close() stops the thread """
+
+    def __init__(self, dataset, split, batch_size, block_size, device='cpu', depth=2, seed=1337, generator=None):
+        self.args = (split, batch_size, block_size, device)
+        self.dataset = dataset
+        self.queue = queue.Queue(maxsize=depth) # bounded, the producer blocks once it is ahead
+        # own generator so the producer doesn't race the training thread for the global one,
+        # pass one to continue its stream, e.g. restored from a checkpoint
+        self.generator = generator if generator is not None else torch.Generator().manual_seed(seed)
+        # the generator state the first batch not yet returned by next() is drawn from, see get_state
+        self.state = self.generator.get_state()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
+
+    def _produce(self):
+        try:
+            while not self.stopping.is_set():
+                batch = self.dataset.get_batch(*self.args, generator=self.generator)
+                self._put((batch, self.generator.get_state()))
+        except Exception as e:
+            # handed to the consumer, otherwise next() would wait forever on a dead thread
+            self._put(e)
+
+    def _put(self, item):
+        # gives up once close() is called instead of blocking on a queue nobody reads anymore
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def next(self):
+        item = self.queue.get()
+        if isinstance(item, Exception):
+            raise item
+        batch, self.state = item
+        return batch
+
+    def get_state(self):
+        # like Generator.get_state, but of the consumed stream: the producer's generator is
+        # already past the queued batches, restoring this one redraws them instead of skipping them
+        return self.state
+
+    def close(self):
+        self.stopping.set()
+        self.thread.join()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+from dataclasses import asdict
+from typing import List, Tuple
+
+import torch
+import torch.nn as nn
+from torch.nn import functional as F
+
+from checkpoint import load_pretrained
+
+# exports a checkpoint written by gpt.py as a frozen TorchScript decode step, model.ts, with the kv
+# cache as explicit inputs/outputs; run_exported.py generates from it with nothing but torch and tokenizer.py
+#
+#   python export.py
+#   python run_exported.py --prompt "Dorothy"
+
+class DecodeLayer(nn.Module):
+    """ one Block with the keys/values of the earlier positions passed in and the grown ones returned """
+
+    def __init__(self, block):
+        super().__init__()
+        self.n_head = block.sa.num_heads
+        self.head_size = block.sa.head_size
+        self.ln1 = block.ln1
+        self.qkv = block.sa.qkv
+        self.proj = block.sa.proj
+        self.ln2 = block.ln2
+        self.ffwd = block.ffwd.net
+
+    def forward(self, x: torch.Tensor, k_cache: torch.Tensor, v_cache: torch.Tensor, mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        B, T, C = x.shape
+        q, k, v = self.qkv(self.ln1(x)).split(self.n_head * self.head_size, dim=2)
+        q = q.view(B, T, self.n_head, self.head_size).transpose(1, 2) # (B,nh,T,hs)
+        k = torch.cat((k_cache, k.view(B, T, self.n_head, self.head_size).transpose(1, 2)), dim=2) # (B,nh,T_k,hs)
+        v = torch.cat((v_cache, v.view(B, T, self.n_head, self.head_size).transpose(1, 2)), dim=2) # (B,nh,T_k,hs)
+        wei = q @ k.transpose(-2, -1) * self.head_size**-0.5 # (B,nh,T,T_k)
+        wei = F.softmax(wei.masked_fill(~mask, float('-inf')), dim=-1)
+        out = (wei @ v).transpose(1, 2).reshape(B, T, self.n_head * self.head_size)
+        x = x + self.proj(out)
+        x = x + self.ffwd(self.ln2(x))
+        return x, k, v
+
+class DecodeStep(nn.Module):
+    """ the forward pass of GPTLanguageModel as a pure function of (new tokens, kv cache), for TorchScript """
+
+    def __init__(self, model):
+        super().__init__()
+        assert model.config.position_encoding == 'learned', 'only the learned position table is exported'
+        self.token_embedding_table = model.token_embedding_table
+        self.position_embedding_table = model.position_embedding_table
+        self.layers = nn.ModuleList([DecodeLayer(block) for block in model.blocks])
+        self.ln_f = model.ln_f
+        self.lm_head = model.lm_head
+
+    def forward(self, idx: torch.Tensor, k_cache: torch.Tensor, v_cache: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        # idx (B,T) are the tokens after the T_c cached ones, the caches are (n_layer, B, nh, T_c, hs);
+        # returns the (B, vocab_size) logits of the last position and the caches grown to T_c + T
+        B, T = idx.shape
+        start = k_cache.shape[3]
+        pos = torch.arange(start, start + T, device=idx.device)
+        x = self.token_embedding_table(idx) + self.position_embedding_table(pos) # (B,T,C)
+        # the queries are the last T positions of the keys
+        mask = torch.arange(start + T, device=idx.device)[None, :] <= pos[:, None] # (T, T_k)
+        new_k: List[torch.Tensor] = []
+        new_v: List[torch.Tensor] = []
+        for i, layer in enumerate(self.layers):
+            x, k, v = layer(x, k_cache[i], v_cache[i], mask)
+            new_k.append(k)
+            new_v.append(v)
+        logits = self.lm_head(self.ln_f(x[:, -1, :])) # (B, vocab_size)
+        return logits, torch.stack(new_k), torch.stack(new_v)
+
+def export(checkpoint_dir, path):
+    # script, freeze (weights become constants) and let the jit fold what it can for inference;
+    # the config and the vocabulary travel inside the archive
+    model, tokenizer = load_pretrained(checkpoint_dir, 'cpu')
+    step = torch.jit.script(DecodeStep(model).eval())
+    step = torch.jit.optimize_for_inference(torch.jit.freeze(step))
+    extra_files = {
+        'config.json': json.dumps(asdict(model.config)),
+        'tokenizer.json': json.dumps({'chars': tokenizer.chars, 'merges': tokenizer.merges}, ensure_ascii=False),
+    }
+    torch.jit.save(step, path, _extra_files=extra_files)
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='export a GPTLanguageModel checkpoint to TorchScript')
+    parser.add_argument('--checkpoint_dir', default='checkpoints')
+    parser.add_argument('--output', default=None, help='defaults to model.ts in the checkpoint dir')
+    args = parser.parse_args()
+    path = export(args.checkpoint_dir, args.output or os.path.join(args.checkpoint_dir, 'model.ts'))
+    print(f"wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
@@ -0,0 +1,103 @@
+import torch
+from torch.nn import functional as F
+
+from model import sample_next
+
+# decoding many prompts of different lengths in one batch: they are left padded so every row's
+# next token sits in the last column, and the attention mask keeps the padding out of attention
+# and out of the positions. beam search keeps its beams as extra rows of the same batch
+
+def left_pad(prompts, pad_id=0, device='cpu'):
+    # (B, T) tokens of the prompts right-aligned, and the (B, T) mask with 1 for the real ones
+    T = max(len(p) for p in prompts)
+    idx = torch.full((len(prompts), T), pad_id, dtype=torch.long)
+    mask = torch.zeros((len(prompts), T), dtype=torch.long)
+    for row, p in enumerate(prompts):
+        idx[row, T-len(p):] = torch.tensor(p, dtype=torch.long)
+        mask[row, T-len(p):] = 1
+    return idx.to(device), mask.to(device)
+
+def next_logits(model, idx, mask):
+    # (B, C) logits of the last column, with the kv cache the same way GPTLanguageModel.generate_stream uses it
+    block_size = model.config.block_size
+    rolling = model.config.position_encoding == 'rope'
+    if idx.shape[1] > block_size and not rolling:
+        # the learned positions of every row shift once the window slides, recompute it
+        model.reset_cache()
+        logits, _ = model(idx[:, -block_size:], attention_mask=mask[:, -block_size:])
+    elif model.cache_len == 0:
+        # prime the cache with the padded prompts
+        logits, _ = model(idx, use_cache=True, attention_mask=mask)
+    else:
+        logits, _ = model(idx[:, -1:], use_cache=True, attention_mask=mask)
+    return logits[:, -1, :]
+
+@torch.no_grad()
+def generate_many(model, prompts, max_new_tokens, temperature=1.0, top_k=None, top_p=None):
+    # prompts are lists of token ids of any lengths, decoded together; returns the new ids of every prompt
+    device = model.device
+    idx, mask = left_pad(prompts, device=device)
+    new = []
+    model.reset_cache()
+    try:
+        for _ in range(max_new_tokens):
+            idx_next = sample_next(next_logits(model, idx, mask), temperature, top_k, top_p) # (B, 1)
+            idx = torch.cat((idx, idx_next), dim=1)
+            mask = torch.cat((mask, torch.ones_like(idx_next)), dim=1)
+            new.append(idx_next)
+    finally:
+        model.reset_cache()
+    return torch.cat(new, dim=1).tolist() if new else [[] for _ in prompts]
+
+@torch.no_grad()
+def beam_search(model, prompts, max_new_tokens, num_beams=4, length_penalty=1.0, eos_id=None):
+    # the num_beams most likely continuations of every prompt are kept as rows of one (B*K, T) batch;
+    # returns (new ids, score) of the best beam of every prompt, where the score is the summed
+    # log-prob over (generated length ** length_penalty), > 1 favours longer beams, < 1 shorter ones
+    device = model.device
+    B, K = len(prompts), num_beams
+    idx, mask = left_pad(prompts, device=device)
+    prompt_len = idx.shape[1]
+    # the beams of a prompt are adjacent rows; they start out identical, so only the first one is expanded at first
+    idx, mask = idx.repeat_interleave(K, dim=0), mask.repeat_interleave(K, dim=0) # (B*K, T)
+    scores = torch.zeros((B, K), device=device)
+    scores[:, 1:] = float('-inf')
+    scores = scores.view(-1) # (B*K,)
+    lengths = torch.zeros(B * K, device=device)
+    finished = torch.zeros(B * K, dtype=torch.bool, device=device)
+    offsets = torch.arange(B, device=device)[:, None] * K # first row of every prompt's beams
+    model.reset_cache()
+    try:
+        for _ in range(max_new_tokens):
+            logprobs = F.log_softmax(next_logits(model, idx, mask).float(), dim=-1) # (B*K, C)
+            if eos_id is not None:
+                # a finished beam can only continue with eos, for free, so its score and length stay put
+                frozen = torch.full_like(logprobs, float('-inf'))
+                frozen[:, eos_id] = 0.0
+                logprobs = torch.where(finished[:, None], frozen, logprobs)
+            C = logprobs.shape[-1]
+            # the K best (beam, token) extensions of every prompt out of its K*C candidates
+            top_scores, flat = (scores[:, None] + logprobs).view(B, K * C).topk(K, dim=-1) # (B, K)
+            origin = (flat // C + offsets).view(-1) # the row every new beam extends
+            tokens = (flat % C).view(-1, 1) # (B*K, 1)
+            scores = top_scores.view(-1)
+            lengths = lengths[origin] + (~finished[origin]).float()
+            finished = finished[origin]
+            if eos_id is not None:
+                finished = finished | (tokens[:, 0] == eos_id)
+            idx = torch.cat((idx[origin], tokens), dim=1)
+            mask = torch.cat((mask[origin], torch.ones_like(tokens)), dim=1)
+            model.reorder_cache(origin)
+            if finished.all():
+                break
+    finally:
+        model.reset_cache()
+    normalized = scores / lengths.clamp(min=1) ** length_penalty
+    best = (normalized.view(B, K).argmax(dim=-1) + offsets[:, 0]).tolist()
+    results = []
+    for row in best:
+        new = idx[row, prompt_len:].tolist()
+        if eos_id is not None and eos_id in new:
+            new = new[:new.index(eos_id) + 1]
+        results.append((new, normalized[row].item()))
+    return results
@@ -1,225 +1,353 @@
+import argparse
+import contextlib
+import dataclasses
+import os
+import queue
+import traceback
+from dataclasses import dataclass
+
+import numpy as np
 import torch
-import torch.nn as nn
-from torch.nn import functional as F
-
-# hyperparameters
-batch_size = 64 # how many independent sequences will we process in parallel?
-block_size = 256 # what is the maximum context length for predictions?
-max_iters = 5000
-eval_interval = 500
-learning_rate = 3e-4
-device = 'cuda' if torch.cuda.is_available() else 'cpu'
-eval_iters = 200
-n_embd = 384
-n_head = 6
-n_layer = 6
-dropout = 0.2
-# ------------
-
-torch.manual_seed(1337)
-
-# wget https://raw.githubusercontent.com/karpathy/char-rnn/master/data/tinyshakespeare/input.txt
-with open('wizard_of_oz.txt', 'r', encoding='utf-8') as f:
-    text = f.read()
-
-# here are all the unique characters that occur in this text
-chars = sorted(list(set(text)))
-vocab_size = len(chars)
-# create a mapping from characters to integers
-stoi = { ch:i for i,ch in enumerate(chars) }
-itos = { i:ch for i,ch in enumerate(chars) }
-encode = lambda s: [stoi[c] for c in s] # encoder: take a string, output a list of integers
-decode = lambda l: ''.join([itos[i] for i in l]) # decoder: take a list of integers, output a string
-
-# Train and test splits
-data = torch.tensor(encode(text), dtype=torch.long)
-n = int(0.9*len(data)) # first 90% will be train, rest val
-train_data = data[:n]
-val_data = data[n:]
-
-# data loading
-def get_batch(split):
-    # generate a small batch of data of inputs x and targets y
-    data = train_data if split == 'train' else val_data
-    ix = torch.randint(len(data) - block_size, (batch_size,))
-    x = torch.stack([data[i:i+block_size] for i in ix])
-    y = torch.stack([data[i+1:i+block_size+1] for i in ix])
-    x, y = x.to(device), y.to(device)
-    return x, y
-
-@torch.no_grad()
-def estimate_loss():
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+
+from checkpoint import load_checkpoint, save_checkpoint
+from data import BatchPrefetcher, CharDataset
+from model import GPTConfig, GPTLanguageModel
+from profiling import PhaseTimer, trace_profiler
+
+# training library and command line for the char-level GPT, nothing runs at import time
+#
+#   python gpt.py                                  # the defaults below
+#   python gpt.py --n_layer 4 --max_iters 2000     # any GPTConfig / TrainConfig field is a flag
+#   torchrun --standalone --nproc_per_node=4 gpt.py
+
+@dataclass
+class TrainConfig:
+    data_dir: str = '.' # where prepare.py wrote train.bin, val.bin and meta.json
+    batch_size: int = 64 # how many independent sequences will we process in parallel?
+    max_iters: int = 5000
+    eval_interval: int = 500
+    learning_rate: float = 3e-4
+    device: str = 'cuda' if torch.cuda.is_available() else 'cpu'
+    seed: int = 1337
+    eval_windows: int = 2048 # windows per split in the fixed evaluation set
+    eval_batch_size: int = 128 # windows per forward pass during evaluation, nothing is kept for backward
+    eval_async: bool = False # evaluate weight snapshots in a separate process while training continues
+    eval_threads: int = 2 # intra-op threads of the evaluation process
+    prefetch: bool = True # sample training batches on a background thread
+    prefetch_depth: int = 2 # batches kept ready in the prefetch queue
+    checkpoint_dir: str = 'checkpoints' # where model, optimizer and rng state are saved, '' to not save
+    checkpoint_interval: int = 500 # save every this many steps, and after the last one
+    resume: bool = False # continue training from the checkpoint in checkpoint_dir
+    dtype: str = 'float32' # 'bfloat16' runs forward and loss under autocast, the weights stay fp32
+    compile_model: bool = False # torch.compile the model for training (PyTorch 2.0+)
+    gradient_accumulation_steps: int = 1 # every optimizer step sums the gradients of this many micro-batches of batch_size // gradient_accumulation_steps
+    activation_checkpointing: bool = False # recompute each Block's activations during backward instead of keeping them
+    ddp_world_size: int = 1 # data-parallel ranks to launch on this machine, ignored when started by torchrun
+    ddp_backend: str = 'gloo'
+    sample_tokens: int = 500 # characters sampled from the model after training, 0 for none
+    profile: bool = True # time every phase of the step and print a summary line with every evaluation
+    trace_steps: int = 0 # record this many steps with torch.profiler into trace_file, 0 for no trace
+    trace_start: int = 10 # steps to skip before the trace starts, the first ones include warmup
+    trace_file: str = 'trace.json' # Chrome trace, open it in chrome://tracing or ui.perfetto.dev
+
+# training modes
+def resolve_dtype(dtype, device_type):
+    # the dtype autocast_context can actually run on this backend, checked (and reported) once per run
+    if dtype != 'bfloat16':
+        return 'float32'
+    if device_type == 'cuda' and not torch.cuda.is_bf16_supported():
+        print("bfloat16 is not supported on this gpu, falling back to float32")
+        return 'float32'
+    try:
+        torch.autocast(device_type=device_type, dtype=torch.bfloat16)
+    except RuntimeError as e:
+        print(f"bfloat16 autocast is not available ({e}), falling back to float32")
+        return 'float32'
+    return 'bfloat16'
+
+def autocast_context(dtype, device_type):
+    # bf16 autocast for a dtype resolve_dtype returned, else a no-op context
+    if dtype != 'bfloat16':
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device_type, dtype=torch.bfloat16)
+
+def maybe_compile(model, xb, yb, dtype='float32'):
+    # torch.compile compiles lazily, so one forward pass on a real batch checks the backend works
+    if not hasattr(torch, 'compile'):
+        print("torch.compile needs PyTorch 2.0, training eagerly")
+        return model
+    compiled = torch.compile(model)
+    try:
+        with autocast_context(dtype, xb.device.type):
+            compiled(xb, yb)
+    except Exception as e:
+        print(f"torch.compile failed ({type(e).__name__}: {e}), training eagerly")
+        return model
+    return compiled
+
+# evaluation
+def build_eval_set(dataset, config, block_size):
+    return {split: dataset.eval_windows(split, config.eval_windows, block_size) for split in ['train', 'val']}
+
+@torch.inference_mode()
+def evaluate(model, eval_set, batch_size=128, dtype='float32'):
     out = {}
+    was_training = model.training
     model.eval()
-    for split in ['train', 'val']:
-        losses = torch.zeros(eval_iters)
-        for k in range(eval_iters):
-            X, Y = get_batch(split)
-            logits, loss = model(X, Y)
-            losses[k] = loss.item()
-        out[split] = losses.mean()
-    model.train()
+    model_device = model.device
+    for split, windows in eval_set.items():
+        total = 0.0
+        for i in range(0, len(windows), batch_size):
+            batch = torch.from_numpy(windows[i:i+batch_size].astype(np.int64)).to(model_device)
+            with autocast_context(dtype, model_device.type):
+                logits, loss = model(batch[:, :-1].contiguous(), batch[:, 1:].contiguous())
+            total += loss.item() * len(batch)
+        out[split] = total / len(windows)
+    model.train(was_training)
     return out
 
-class Head(nn.Module):
-    """ one head of self-attention """
-
-    def __init__(self, head_size):
-        super().__init__()
-        self.key = nn.Linear(n_embd, head_size, bias=False)
-        self.query = nn.Linear(n_embd, head_size, bias=False)
-        self.value = nn.Linear(n_embd, head_size, bias=False)
-        self.register_buffer('tril', torch.tril(torch.ones(block_size, block_size)))
-
-        self.dropout = nn.Dropout(dropout)
-
-    def forward(self, x):
-        # input of size (batch, time-step, channels)
-        # output of size (batch, time-step, head size)
-        B,T,C = x.shape
-        k = self.key(x)   # (B,T,hs)
-        q = self.query(x) # (B,T,hs)
-        # compute attention scores ("affinities")
-        wei = q @ k.transpose(-2,-1) * k.shape[-1]**-0.5 # (B, T, hs) @ (B, hs, T) -> (B, T, T)
-        wei = wei.masked_fill(self.tril[:T, :T] == 0, float('-inf')) # (B, T, T)
-        wei = F.softmax(wei, dim=-1) # (B, T, T)
-        wei = self.dropout(wei)
-        # perform the weighted aggregation of the values
-        v = self.value(x) # (B,T,hs)
-        out = wei @ v # (B, T, T) @ (B, T, hs) -> (B, T, hs)
-        return out
-
-class MultiHeadAttention(nn.Module):
-    """ multiple heads of self-attention in parallel """
-
-    def __init__(self, num_heads, head_size):
-        super().__init__()
-        self.heads = nn.ModuleList([Head(head_size) for _ in range(num_heads)])
-        self.proj = nn.Linear(head_size * num_heads, n_embd)
-        self.dropout = nn.Dropout(dropout)
-
-    def forward(self, x):
-        out = torch.cat([h(x) for h in self.heads], dim=-1)
-        out = self.dropout(self.proj(out))
-        return out
-
-class FeedFoward(nn.Module):
-    """ a simple linear layer followed by a non-linearity """
-
-    def __init__(self, n_embd):
-        super().__init__()
-        self.net = nn.Sequential(
-            nn.Linear(n_embd, 4 * n_embd),
-            nn.ReLU(),
-            nn.Linear(4 * n_embd, n_embd),
-            nn.Dropout(dropout),
-        )
-
-    def forward(self, x):
-        return self.net(x)
-
-class Block(nn.Module):
-    """ Transformer block: communication followed by computation """
-
-    def __init__(self, n_embd, n_head):
-        # n_embd: embedding dimension, n_head: the number of heads we'd like
-        super().__init__()
-        head_size = n_embd // n_head
-        self.sa = MultiHeadAttention(n_head, head_size)
-        self.ffwd = FeedFoward(n_embd)
-        self.ln1 = nn.LayerNorm(n_embd)
-        self.ln2 = nn.LayerNorm(n_embd)
-
-    def forward(self, x):
-        x = x + self.sa(self.ln1(x))
-        x = x + self.ffwd(self.ln2(x))
-        return x
-
-class GPTLanguageModel(nn.Module):
-
-    def __init__(self):
-        super().__init__()
-        # each token directly reads off the logits for the next token from a lookup table
-        self.token_embedding_table = nn.Embedding(vocab_size, n_embd)
-        self.position_embedding_table = nn.Embedding(block_size, n_embd)
-        self.blocks = nn.Sequential(*[Block(n_embd, n_head=n_head) for _ in range(n_layer)])
-        self.ln_f = nn.LayerNorm(n_embd) # final layer norm
-        self.lm_head = nn.Linear(n_embd, vocab_size)
-
-        # better init, not covered in the original GPT video, but important, will cover in followup video
-        self.apply(self._init_weights)
-
-    def _init_weights(self, module):
-        if isinstance(module, nn.Linear):
-            torch.nn.init.normal_(module.weight, mean=0.0, std=0.02)
-            if module.bias is not None:
-                torch.nn.init.zeros_(module.bias)
-        elif isinstance(module, nn.Embedding):
-            torch.nn.init.normal_(module.weight, mean=0.0, std=0.02)
-
-    def forward(self, idx, targets=None):
-        B, T = idx.shape
-
-        # idx and targets are both (B,T) tensor of integers
-        tok_emb = self.token_embedding_table(idx) # (B,T,C)
-        pos_emb = self.position_embedding_table(torch.arange(T, device=device)) # (T,C)
-        x = tok_emb + pos_emb # (B,T,C)
-        x = self.blocks(x) # (B,T,C)
-        x = self.ln_f(x) # (B,T,C)
-        logits = self.lm_head(x) # (B,T,vocab_size)
-
-        if targets is None:
-            loss = None
+def _eval_worker(model_config, config, jobs, results):
+    # runs in the evaluation process: rebuilds the (deterministic) eval set once,
+    # then scores every weight snapshot it is sent until it gets None;
+    # a failure is sent back as (None, traceback) for the trainer to raise
+    try:
+        torch.set_num_threads(config.eval_threads)
+        dtype = resolve_dtype(config.dtype, torch.device(config.device).type)
+        model = GPTLanguageModel(model_config).to(config.device)
+        eval_set = build_eval_set(CharDataset(config.data_dir), config, model_config.block_size)
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            iter, state_dict = job
+            model.load_state_dict(state_dict)
+            results.put((iter, evaluate(model, eval_set, config.eval_batch_size, dtype)))
+    except Exception:
+        results.put((None, traceback.format_exc()))
+
+class AsyncEvaluator:
+    """ evaluates snapshots of the weights in a separate process so training isn't blocked """
+
+    def __init__(self, model_config, config):
+        ctx = mp.get_context('spawn')
+        self.jobs = ctx.Queue()
+        self.results = ctx.Queue()
+        self.pending = 0
+        self.process = ctx.Process(target=_eval_worker, args=(model_config, config, self.jobs, self.results), daemon=True)
+        self.process.start()
+
+    def submit(self, iter, model):
+        # copy the weights, training keeps updating the live ones
+        snapshot = {k: v.detach().to('cpu', copy=True) for k, v in model.state_dict().items()}
+        self.jobs.put((iter, snapshot))
+        self.pending += 1
+
+    def poll(self, block=False):
+        # (iter, losses) of the evaluations finished so far, waits for all of them if block;
+        # raises if the evaluation process failed or died
+        done = []
+        while self.pending > 0:
+            # checked before reading, whatever a dead process sent is already in the queue
+            alive = self.process.is_alive()
+            try:
+                iter, losses = self.results.get(timeout=1.0) if block else self.results.get_nowait()
+            except queue.Empty:
+                if not alive:
+                    raise RuntimeError(f"evaluation process exited with code {self.process.exitcode}")
+                if block:
+                    continue
+                break
+            if iter is None:
+                raise RuntimeError(f"evaluation process failed:\n{losses}")
+            done.append((iter, losses))
+            self.pending -= 1
+        return done
+
+    def close(self):
+        done = self.poll(block=True)
+        self.jobs.put(None)
+        self.process.join()
+        return done
+
+# training
+def train(model_config, config, dataset=None, rank=0, world_size=1, should_stop=None):
+    # one data-parallel rank, or the whole run when world_size is 1
+    # pass a loaded dataset to reuse it across runs, returns the model and its (iter, losses) history
+    # should_stop(iter, losses) is called after every evaluation, training ends early once it returns True
+    # (with ddp every rank stops at the next evaluation step after rank 0's should_stop did)
+    ddp = world_size > 1
+    master = rank == 0 # only rank 0 logs, evaluates, checkpoints and samples
+    if ddp:
+        dist.init_process_group(backend=config.ddp_backend, rank=rank, world_size=world_size)
+        # split the cores between the ranks instead of every rank using all of them
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    torch.manual_seed(config.seed + rank) # every rank samples its own batches
+    device = config.device
+    dtype = resolve_dtype(config.dtype, torch.device(device).type)
+    dataset = dataset or CharDataset(config.data_dir)
+    model_config = dataclasses.replace(model_config, vocab_size=dataset.vocab_size)
+    block_size = model_config.block_size
+
+    model = GPTLanguageModel(model_config)
+    model.activation_checkpointing = config.activation_checkpointing
+    m = model.to(device)
+    if master:
+        # print the number of parameters in the model
+        print(sum(p.numel() for p in m.parameters())/1e6, 'M parameters')
+
+    # create a PyTorch optimizer
+    optimizer = torch.optim.AdamW(model.parameters(), lr=config.learning_rate)
+
+    assert config.batch_size % config.gradient_accumulation_steps == 0, 'batch_size must split evenly into micro-batches'
+    micro_batch_size = config.batch_size // config.gradient_accumulation_steps
+    # the prefetcher samples from its own generator, without it batches come from the global rng
+    batch_rng = torch.Generator().manual_seed(config.seed + rank) if config.prefetch else None
+    start_iter = 0
+    if config.resume:
+        # the saved rng state is rank 0's, the other ranks keep their own streams
+        start_iter = load_checkpoint(config.checkpoint_dir, m, optimizer, device, batch_rng, restore_rng=master)
+        if master:
+            print(f"resuming from step {start_iter}")
+    train_batches = None
+    if config.prefetch:
+        # started after the resume, so it continues the restored stream
+        train_batches = BatchPrefetcher(dataset, 'train', micro_batch_size, block_size, device, config.prefetch_depth, generator=batch_rng)
+        # checkpoints save the state of the consumed batches, not the producer's which is ahead of them
+        batch_rng = train_batches
+    next_batch = train_batches.next if config.prefetch else lambda: dataset.get_batch('train', micro_batch_size, block_size, device)
+    if config.compile_model:
+        # m stays the plain module, it is what gets checkpointed, snapshotted and sampled from
+        model = maybe_compile(m, *dataset.get_batch('train', micro_batch_size, block_size, device), dtype)
+    if ddp:
+        # averages the gradients over all ranks during backward
+        model = DDP(model)
+    timer = PhaseTimer(device, enabled=config.profile)
+    profiler = None
+    if master and config.trace_steps > 0:
+        profiler = trace_profiler(config.trace_file, config.trace_start, config.trace_steps, device)
+        profiler.start()
+    if master:
+        if config.eval_async:
+            evaluator = AsyncEvaluator(model_config, config)
         else:
-            B, T, C = logits.shape
-            logits = logits.view(B*T, C)
-            targets = targets.view(B*T)
-            loss = F.cross_entropy(logits, targets)
-
-        return logits, loss
-
-    def generate(self, idx, max_new_tokens):
-        # idx is (B, T) array of indices in the current context
-        for _ in range(max_new_tokens):
-            # crop idx to the last block_size tokens
-            idx_cond = idx[:, -block_size:]
-            # get the predictions
-            logits, loss = self(idx_cond)
-            # focus only on the last time step
-            logits = logits[:, -1, :] # becomes (B, C)
-            # apply softmax to get probabilities
-            probs = F.softmax(logits, dim=-1) # (B, C)
-            # sample from the distribution
-            idx_next = torch.multinomial(probs, num_samples=1) # (B, 1)
-            # append sampled index to the running sequence
-            idx = torch.cat((idx, idx_next), dim=1) # (B, T+1)
-        return idx
-
-model = GPTLanguageModel()
-m = model.to(device)
-# print the number of parameters in the model
-print(sum(p.numel() for p in m.parameters())/1e6, 'M parameters')
-
-# create a PyTorch optimizer
-optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
-
-for iter in range(max_iters):
-
-    # every once in a while evaluate the loss on train and val sets
-    if iter % eval_interval == 0 or iter == max_iters - 1:
-        losses = estimate_loss()
+            eval_set = build_eval_set(dataset, config, block_size)
+    summaries = {} # step -> timing summary of the steps before it, printed once its losses are in
+    history = []
+    stopped = False
+
+    def report(iter, losses):
+        nonlocal stopped
+        history.append((iter, losses))
         print(f"step {iter}: train loss {losses['train']:.4f}, val loss {losses['val']:.4f}")
-
-    # sample a batch of data
-    xb, yb = get_batch('train')
-
-    # evaluate the loss
-    logits, loss = model(xb, yb)
-    optimizer.zero_grad(set_to_none=True)
-    loss.backward()
-    optimizer.step()
-
-# generate from the model
-context = torch.zeros((1, 1), dtype=torch.long, device=device)
-print(decode(m.generate(context, max_new_tokens=500)[0].tolist()))
-#open('more.txt', 'w').write(decode(m.generate(context, max_new_tokens=10000)[0].tolist()))
\ No newline at end of file
+        summary = summaries.pop(iter)
+        if summary:
+            print(f"step {iter}: {summary}")
+        if should_stop is not None and should_stop(iter, losses):
+            stopped = True
+
+    for iter in range(start_iter, config.max_iters):
+        eval_step = iter % config.eval_interval == 0 or iter == config.max_iters - 1
+
+        # every once in a while evaluate the loss on train and val sets
+        if master and eval_step:
+            summaries[iter] = timer.summary()
+            with timer.phase('eval'):
+                if config.eval_async:
+                    evaluator.submit(iter, m)
+                else:
+                    losses = evaluate(m, eval_set, config.eval_batch_size, dtype)
+            if not config.eval_async:
+                report(iter, losses)
+        if master and config.eval_async:
+            for done in evaluator.poll():
+                report(*done)
+        if ddp and should_stop is not None:
+            # only rank 0 decides, the others must break at the same step or they'd wait in the all-reduce forever
+            if eval_step:
+                flag = torch.tensor([int(stopped)], device=device if config.ddp_backend == 'nccl' else 'cpu')
+                dist.broadcast(flag, src=0)
+                if flag.item():
+                    break
+        elif stopped:
+            break
+
+        optimizer.zero_grad(set_to_none=True)
+        for micro_step in range(config.gradient_accumulation_steps):
+            # sample a batch of data
+            with timer.phase('data'):
+                xb, yb = next_batch()
+
+            # evaluate the loss, ddp only has to all-reduce after the last micro-batch
+            last = micro_step == config.gradient_accumulation_steps - 1
+            with (model.no_sync() if ddp and not last else contextlib.nullcontext()):
+                with timer.phase('forward'), autocast_context(dtype, xb.device.type):
+                    logits, loss = model(xb, yb)
+                # scaled so the summed gradients are those of the mean over the whole batch
+                with timer.phase('backward'):
+                    (loss / config.gradient_accumulation_steps).backward()
+        with timer.phase('optimizer'):
+            optimizer.step()
+        # samples and tokens of all ranks, each of them processes batch_size sequences
+        timer.step(config.batch_size * world_size, config.batch_size * block_size * world_size)
+
+        if master and config.checkpoint_dir and ((iter + 1) % config.checkpoint_interval == 0 or iter == config.max_iters - 1):
+            with timer.phase('checkpoint'):
+                save_checkpoint(config.checkpoint_dir, iter, m, optimizer, dataset.chars, batch_rng, dataset.merges)
+        if profiler is not None:
+            profiler.step()
+
+    if train_batches is not None:
+        train_batches.close()
+    if profiler is not None:
+        profiler.stop()
+        if profiler.trace_written:
+            print(f"torch.profiler trace written to {config.trace_file}")
+        else:
+            print(f"no torch.profiler trace, the run ended before step {config.trace_start} was profiled")
+    if master and config.eval_async:
+        for done in evaluator.close():
+            report(*done)
+    if ddp:
+        dist.destroy_process_group()
+
+    if master and config.sample_tokens > 0:
+        # generate from the model
+        context = torch.zeros((1, 1), dtype=torch.long, device=device)
+        print(dataset.decode(m.generate(context, max_new_tokens=config.sample_tokens)[0].tolist()))
+        #open('more.txt', 'w').write(dataset.decode(m.generate(context, max_new_tokens=10000)[0].tolist()))
+    return m, history
+
+def _train_rank(rank, model_config, config, world_size):
+    # mp.spawn entry point, the rank comes first
+    train(model_config, config, rank=rank, world_size=world_size)
+
+def parse_args(argv=None):
+    # every GPTConfig / TrainConfig field becomes a --flag with the dataclass default
+    parser = argparse.ArgumentParser(description='train the char-level GPT')
+    for cls in (GPTConfig, TrainConfig):
+        for f in dataclasses.fields(cls):
+            if f.name == 'vocab_size':
+                continue # comes from the dataset
+            if f.type in (bool, 'bool'):
+                parser.add_argument(f'--{f.name}', type=lambda v: v.lower() in ('1', 'true', 'yes'), default=f.default)
+            else:
+                parser.add_argument(f'--{f.name}', type=type(f.default), default=f.default)
+    args = vars(parser.parse_args(argv))
+    model_config = GPTConfig(**{f.name: args[f.name] for f in dataclasses.fields(GPTConfig) if f.name in args})
+    config = TrainConfig(**{f.name: args[f.name] for f in dataclasses.fields(TrainConfig)})
+    return model_config, config
+
+if __name__ == '__main__':
+    model_config, config = parse_args()
+    if 'RANK' in os.environ:
+        # started by torchrun, e.g. `torchrun --standalone --nproc_per_node=4 gpt.py`
+        train(model_config, config, rank=int(os.environ['RANK']), world_size=int(os.environ['WORLD_SIZE']))
+    elif config.ddp_world_size > 1:
+        os.environ.setdefault('MASTER_ADDR', '127.0.0.1')
+        os.environ.setdefault('MASTER_PORT', '29500')
+        mp.spawn(_train_rank, args=(model_config, config, config.ddp_world_size), nprocs=config.ddp_world_size)
+    else:
+        train(model_config, config)
@@ -0,0 +1,330 @@
+from dataclasses import dataclass
+
+import torch
+import torch.nn as nn
+from torch.nn import functional as F
+from torch.utils.checkpoint import checkpoint
+
+@dataclass
+class GPTConfig:
+    vocab_size: int = 81 # set from the dataset's meta.json when training
+    block_size: int = 256 # what is the maximum context length for predictions?
+    n_embd: int = 384
+    n_head: int = 6
+    n_layer: int = 6
+    dropout: float = 0.2
+    # 'learned': a position embedding table of block_size rows, 'rope': rotary embeddings of the
+    # queries and keys, which only see relative positions, so generation can keep a rolling kv window
+    position_encoding: str = 'learned'
+    rope_base: float = 10000.0
+
+def next_token_probs(logits, temperature=1.0, top_k=None, top_p=None):
+    # logits is (B, C) for the last time step, returns the (B, C) distribution sample_next draws from
+    if temperature == 0:
+        # greedy: all the mass on the most likely token
+        return F.one_hot(torch.argmax(logits, dim=-1), logits.size(-1)).to(logits.dtype)
+    logits = logits / temperature
+    if top_k is not None:
+        # keep the k largest logits of every row
+        v, _ = torch.topk(logits, min(top_k, logits.size(-1)))
+        logits = logits.masked_fill(logits < v[:, [-1]], float('-inf'))
+    if top_p is not None:
+        # keep the smallest set of most likely tokens whose probability mass reaches top_p
+        sorted_logits, sorted_idx = torch.sort(logits, dim=-1, descending=True)
+        sorted_probs = F.softmax(sorted_logits, dim=-1)
+        # a token is dropped when the tokens ranked above it already cover top_p, so the first always stays
+        drop = torch.cumsum(sorted_probs, dim=-1) - sorted_probs >= top_p
+        sorted_logits = sorted_logits.masked_fill(drop, float('-inf'))
+        logits = torch.full_like(logits, float('-inf')).scatter(-1, sorted_idx, sorted_logits)
+    # apply softmax to get probabilities
+    return F.softmax(logits, dim=-1) # (B, C)
+
+def sample_next(logits, temperature=1.0, top_k=None, top_p=None):
+    # logits is (B, C) for the last time step, returns the sampled (B, 1) indices
+    if temperature == 0:
+        return torch.argmax(logits, dim=-1, keepdim=True) # greedy
+    probs = next_token_probs(logits, temperature, top_k, top_p) # (B, C)
+    # sample from the distribution
+    return torch.multinomial(probs, num_samples=1) # (B, 1)
+
+def apply_rotary(x, cos, sin):
+    # rotate every (first half, second half) channel pair of x (B, nh, T, hs) by its position's angle
+    x1, x2 = x.chunk(2, dim=-1)
+    return torch.cat((x1 * cos - x2 * sin, x1 * sin + x2 * cos), dim=-1)
+
+class MultiHeadAttention(nn.Module):
+    """ multiple heads of self-attention in parallel """
+
+    def __init__(self, config):
+        super().__init__()
+        self.num_heads = config.n_head
+        self.head_size = config.n_embd // config.n_head
+        # key, query and value projections for all heads in one matmul
+        self.qkv = nn.Linear(config.n_embd, 3 * self.head_size * self.num_heads, bias=False)
+        self.proj = nn.Linear(self.head_size * self.num_heads, config.n_embd)
+        self.attn_dropout = nn.Dropout(config.dropout)
+        self.dropout = nn.Dropout(config.dropout)
+        # fused attention kernel, only available from PyTorch 2.0 on
+        self.flash = hasattr(F, 'scaled_dot_product_attention')
+        self.register_buffer('tril', torch.tril(torch.ones(config.block_size, config.block_size)), persistent=False)
+        # with rotary embeddings every query attends to at most the block_size latest keys,
+        # the window it was trained with, and the kv cache is trimmed to that window
+        self.window = config.block_size if config.position_encoding == 'rope' else None
+
+        # keys/values of the tokens seen so far, only filled in during cached decoding
+        self.k_cache = None
+        self.v_cache = None
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # checkpoints trained with one nn.Module per head store heads.{i}.query/key/value,
+        # stack them into the fused qkv weight so they keep loading
+        if prefix + 'heads.0.key.weight' in state_dict:
+            fused = []
+            for name in ('query', 'key', 'value'):
+                fused += [state_dict.pop(f'{prefix}heads.{i}.{name}.weight') for i in range(self.num_heads)]
+            state_dict[prefix + 'qkv.weight'] = torch.cat(fused, dim=0)
+            for i in range(self.num_heads):
+                state_dict.pop(f'{prefix}heads.{i}.tril', None)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+    def window_mask(self, T, T_k, device):
+        # (T, T_k) mask of the keys each of the last T positions may attend to: itself and the window - 1 before it
+        q_pos = torch.arange(T_k - T, T_k, device=device)[:, None]
+        k_pos = torch.arange(T_k, device=device)[None, :]
+        return (k_pos <= q_pos) & (k_pos > q_pos - self.window)
+
+    def forward(self, x, use_cache=False, rope=None, key_padding_mask=None):
+        # input of size (batch, time-step, channels)
+        # output of size (batch, time-step, channels)
+        # rope: the (cos, sin) angles of the T positions, when the model uses rotary embeddings
+        # key_padding_mask: (B, T_k) True for real tokens, False for the left padding of shorter prompts
+        B,T,C = x.shape
+        q, k, v = self.qkv(x).split(self.num_heads * self.head_size, dim=2)
+        q = q.view(B, T, self.num_heads, self.head_size).transpose(1, 2) # (B,nh,T,hs)
+        k = k.view(B, T, self.num_heads, self.head_size).transpose(1, 2) # (B,nh,T,hs)
+        v = v.view(B, T, self.num_heads, self.head_size).transpose(1, 2) # (B,nh,T,hs)
+        if rope is not None:
+            # cached keys were rotated by their own positions when they were added
+            q, k = apply_rotary(q, *rope), apply_rotary(k, *rope)
+        if use_cache:
+            # append the new keys/values to the ones of the earlier tokens
+            if self.k_cache is not None:
+                k = torch.cat((self.k_cache, k), dim=2) # (B,nh,T_k,hs)
+                v = torch.cat((self.v_cache, v), dim=2) # (B,nh,T_k,hs)
+            if self.window is not None:
+                # rolling window: keys older than the window are never attended again
+                self.k_cache, self.v_cache = k[:, :, -self.window:], v[:, :, -self.window:]
+            else:
+                self.k_cache, self.v_cache = k, v
+        T_k = k.shape[2]
+        if self.window is not None:
+            mask = self.window_mask(T, T_k, x.device) # (T, T_k)
+        else:
+            # the queries are the last T positions of the key sequence
+            mask = self.tril[T_k-T:T_k, :T_k] != 0 # (T, T_k)
+        if key_padding_mask is not None:
+            # nothing attends to padding, except the padding itself, so its softmax row isn't all -inf (NaN)
+            is_self = torch.arange(T_k, device=x.device)[None, :] == torch.arange(T_k - T, T_k, device=x.device)[:, None]
+            mask = mask & (key_padding_mask[:, None, None, -T_k:] | is_self) # (B, 1, T, T_k)
+        if self.flash:
+            dropout_p = self.attn_dropout.p if self.training else 0.0
+            if T == T_k and T <= self.tril.shape[0] and key_padding_mask is None:
+                out = F.scaled_dot_product_attention(q, k, v, dropout_p=dropout_p, is_causal=True)
+            else:
+                # is_causal assumes the queries start at key 0 and no window, here they are the last T keys
+                out = F.scaled_dot_product_attention(q, k, v, attn_mask=mask, dropout_p=dropout_p)
+        else:
+            # compute attention scores ("affinities")
+            wei = q @ k.transpose(-2,-1) * k.shape[-1]**-0.5 # (B, nh, T, hs) @ (B, nh, hs, T_k) -> (B, nh, T, T_k)
+            wei = wei.masked_fill(~mask, float('-inf')) # (B, nh, T, T_k)
+            wei = F.softmax(wei, dim=-1) # (B, nh, T, T_k)
+            wei = self.attn_dropout(wei)
+            # perform the weighted aggregation of the values
+            out = wei @ v # (B, nh, T, T_k) @ (B, nh, T_k, hs) -> (B, nh, T, hs)
+        out = out.transpose(1, 2).contiguous().view(B, T, self.num_heads * self.head_size) # re-assemble the heads side by side
+        out = self.dropout(self.proj(out))
+        return out
+
+class FeedFoward(nn.Module):
+    """ a simple linear layer followed by a non-linearity """
+
+    def __init__(self, n_embd, dropout):
+        super().__init__()
+        self.net = nn.Sequential(
+            nn.Linear(n_embd, 4 * n_embd),
+            nn.ReLU(),
+            nn.Linear(4 * n_embd, n_embd),
+            nn.Dropout(dropout),
+        )
+
+    def forward(self, x):
+        return self.net(x)
+
+class Block(nn.Module):
+    """ Transformer block: communication followed by computation """
+
+    def __init__(self, config):
+        super().__init__()
+        self.sa = MultiHeadAttention(config)
+        self.ffwd = FeedFoward(config.n_embd, config.dropout)
+        self.ln1 = nn.LayerNorm(config.n_embd)
+        self.ln2 = nn.LayerNorm(config.n_embd)
+
+    def forward(self, x, use_cache=False, rope=None, key_padding_mask=None):
+        x = x + self.sa(self.ln1(x), use_cache, rope, key_padding_mask)
+        x = x + self.ffwd(self.ln2(x))
+        return x
+
+class GPTLanguageModel(nn.Module):
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        # each token directly reads off the logits for the next token from a lookup table
+        self.token_embedding_table = nn.Embedding(config.vocab_size, config.n_embd)
+        if config.position_encoding == 'rope':
+            head_size = config.n_embd // config.n_head
+            assert head_size % 2 == 0, 'rotary embeddings need an even head size'
+            # one rotation frequency per channel pair, the angle of position t is t * inv_freq
+            inv_freq = 1.0 / (config.rope_base ** (torch.arange(0, head_size, 2).float() / head_size))
+            self.register_buffer('inv_freq', inv_freq, persistent=False)
+        else:
+            self.position_embedding_table = nn.Embedding(config.block_size, config.n_embd)
+        self.blocks = nn.Sequential(*[Block(config) for _ in range(config.n_layer)])
+        self.ln_f = nn.LayerNorm(config.n_embd) # final layer norm
+        self.lm_head = nn.Linear(config.n_embd, config.vocab_size)
+        # number of positions held in the attention kv caches
+        self.cache_len = 0
+        # recompute each Block's activations during backward instead of keeping them, set by the trainer
+        self.activation_checkpointing = False
+
+        # better init, not covered in the original GPT video, but important, will cover in followup video
+        self.apply(self._init_weights)
+
+    def _init_weights(self, module):
+        if isinstance(module, nn.Linear):
+            torch.nn.init.normal_(module.weight, mean=0.0, std=0.02)
+            if module.bias is not None:
+                torch.nn.init.zeros_(module.bias)
+        elif isinstance(module, nn.Embedding):
+            torch.nn.init.normal_(module.weight, mean=0.0, std=0.02)
+
+    @property
+    def device(self):
+        # where inputs have to go; the embedding is never quantized, and the int8 model always lives on the cpu
+        return self.token_embedding_table.weight.device
+
+    def reset_cache(self):
+        for module in self.modules():
+            if isinstance(module, MultiHeadAttention):
+                module.k_cache = None
+                module.v_cache = None
+        self.cache_len = 0
+
+    def truncate_cache(self, length):
+        # forget the cached positions from length on, e.g. draft tokens that were rejected;
+        # the cache must still start at position 0, i.e. hold no more than block_size positions
+        for module in self.modules():
+            if isinstance(module, MultiHeadAttention) and module.k_cache is not None:
+                module.k_cache = module.k_cache[:, :, :length]
+                module.v_cache = module.v_cache[:, :, :length]
+        self.cache_len = min(self.cache_len, length)
+
+    def reorder_cache(self, index):
+        # keep the cached rows in the order of index, e.g. the beams that survived a beam search step
+        for module in self.modules():
+            if isinstance(module, MultiHeadAttention) and module.k_cache is not None:
+                module.k_cache = module.k_cache.index_select(0, index)
+                module.v_cache = module.v_cache.index_select(0, index)
+
+    def forward(self, idx, targets=None, use_cache=False, attention_mask=None):
+        # attention_mask: optional (B, T_k) with 1 for real tokens and 0 for left padding,
+        # over the cached and the new positions
+        B, T = idx.shape
+        # with the kv cache on, idx only holds the tokens after the cached ones
+        start = self.cache_len if use_cache else 0
+
+        # idx and targets are both (B,T) tensor of integers
+        tok_emb = self.token_embedding_table(idx) # (B,T,C)
+        key_padding_mask = None
+        if attention_mask is None:
+            pos = torch.arange(start, start + T, device=idx.device) # (T,)
+        else:
+            # every row counts its positions from its own first real token
+            pos = (attention_mask.long().cumsum(dim=1) - 1).clamp(min=0)[:, -T:] # (B,T)
+            key_padding_mask = attention_mask.bool()
+        rope = None
+        if self.config.position_encoding == 'rope':
+            # angles of the absolute positions, shared by every layer, T may exceed block_size
+            angles = pos[..., None].float() * self.inv_freq # (T, hs/2) or (B, T, hs/2)
+            if angles.dim() == 3:
+                angles = angles[:, None] # (B, 1, T, hs/2), the same for every head
+            rope = (angles.cos(), angles.sin())
+            x = tok_emb # (B,T,C)
+        else:
+            pos_emb = self.position_embedding_table(pos) # (T,C) or (B,T,C)
+            x = tok_emb + pos_emb # (B,T,C)
+        for block in self.blocks:
+            if self.activation_checkpointing and self.training and torch.is_grad_enabled():
+                # keep only the block input, the activations inside are recomputed during backward
+                x = checkpoint(block, x, False, rope, key_padding_mask, use_reentrant=False) # (B,T,C)
+            else:
+                x = block(x, use_cache, rope, key_padding_mask) # (B,T,C)
+        x = self.ln_f(x) # (B,T,C)
+        logits = self.lm_head(x) # (B,T,vocab_size)
+        if use_cache:
+            self.cache_len += T
+
+        if targets is None:
+            loss = None
+        else:
+            B, T, C = logits.shape
+            logits = logits.view(B*T, C)
+            targets = targets.view(B*T)
+            loss = F.cross_entropy(logits, targets)
+
+        return logits, loss
+
+    @torch.no_grad()
+    def generate_stream(self, idx, max_new_tokens, use_cache=True, temperature=1.0, top_k=None, top_p=None):
+        # idx is (B, T) array of indices in the current context
+        # yields every (B, 1) batch of sampled indices as soon as it is sampled
+        block_size = self.config.block_size
+        # rotary keys only depend on where a token is relative to the query, so their cache
+        # stays valid as the window slides and is just trimmed to the last block_size keys
+        rolling = self.config.position_encoding == 'rope'
+        self.reset_cache()
+        try:
+            for _ in range(max_new_tokens):
+                if not use_cache or (idx.shape[1] > block_size and not rolling):
+                    # once the context slides past block_size every token moves to a new
+                    # position, so the cached keys/values are stale and we recompute the window
+                    self.reset_cache()
+                    logits, loss = self(idx[:, -block_size:])
+                elif self.cache_len == 0:
+                    # prime the cache with the whole prompt
+                    logits, loss = self(idx, use_cache=True)
+                else:
+                    # only the newest token has to be projected and attended
+                    logits, loss = self(idx[:, -1:], use_cache=True)
+                # focus only on the last time step
+                logits = logits[:, -1, :] # becomes (B, C)
+                idx_next = sample_next(logits, temperature, top_k, top_p) # (B, 1)
+                # append sampled index to the running sequence
+                idx = torch.cat((idx, idx_next), dim=1) # (B, T+1)
+                yield idx_next
+        finally:
+            # also runs when the caller stops iterating early
+            self.reset_cache()
+
+    def generate(self, idx, max_new_tokens, use_cache=True, temperature=1.0, top_k=None, top_p=None):
+        # idx is (B, T) array of indices in the current context
+        for idx_next in self.generate_stream(idx, max_new_tokens, use_cache, temperature, top_k, top_p):
+            idx = torch.cat((idx, idx_next), dim=1) # (B, T+1)
+        return idx
+
+def quantize_int8(model):
+    # dynamic int8 quantization of every nn.Linear (qkv and output projections, FeedFoward.net, lm_head):
+    # weights are stored as int8, activations are quantized on the fly, cpu only
+    model = model.cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
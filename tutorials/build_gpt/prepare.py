@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from tokenizer import WORD_PATTERN, BPETokenizer
+
+# one-time preprocessing of a text corpus for the char-level trainers: writes the encoded
+# characters to train.bin / val.bin and the vocabulary to meta.json next to the input file,
+# so training memory-maps the ids instead of reading and encoding the text on every start
+#
+#   python prepare.py wizard_of_oz.txt
+#   python ../build_gpt/prepare.py wizard_of_oz.txt   (from tutorials/build_bigram)
+#   python prepare.py wizard_of_oz.txt --bpe_vocab_size 512   # byte-pair encoded ids, gpt.py only
+
+chunk_size = 1 << 24 # characters read per chunk, keeps memory flat on multi-GB corpora
+train_fraction = 0.9 # first 90% will be train, rest val
+
+def iter_chunks(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def encode_chunk(chunk, table, dtype):
+    # translate every character to the code point of its id, then let the codec pack the
+    # ids into bytes, that is a C loop instead of a python one per character
+    ids = chunk.translate(table)
+    if dtype == np.uint8:
+        return np.frombuffer(ids.encode('latin-1'), dtype=np.uint8)
+    return np.frombuffer(ids.encode('utf-16-le'), dtype=np.uint16)
+
+WORD_CHAR = re.compile(r'\w')
+
+def word_boundary(text):
+    # index of the last space that starts a word after a non-space, cutting there leaves every
+    # WORD_PATTERN word whole on one side; the end of text when there is none
+    i = text.rfind(' ')
+    while i > 0:
+        if not text[i-1].isspace() and WORD_CHAR.match(text, i + 1):
+            return i
+        i = text.rfind(' ', 0, i)
+    return len(text)
+
+def iter_pieces(path, n_train):
+    # (split, text) pieces of about chunk_size characters cut at word boundaries, and at the
+    # train/val boundary, so encoding them one by one gives the same ids as encoding each split at once
+    carry, split, seen = '', 'train', 0
+    for chunk in iter_chunks(path):
+        start, seen = seen, seen + len(chunk)
+        if split == 'train' and seen >= n_train:
+            head, chunk = chunk[:n_train - start], chunk[n_train - start:]
+            yield 'train', carry + head
+            carry, split = '', 'val'
+        text = carry + chunk
+        cut = word_boundary(text)
+        yield split, text[:cut]
+        carry = text[cut:]
+    if carry:
+        yield split, carry
+
+def prepare_bpe(input_path, out_dir, vocab_size):
+    # the merges are learned from the train split only, the characters come from all of it;
+    # like the char-level path the corpus is only ever held a chunk at a time: one pass for the
+    # characters, one for the word counts the merges are trained on, one to encode
+    chars = set()
+    n_chars = 0
+    for chunk in iter_chunks(input_path):
+        chars.update(chunk)
+        n_chars += len(chunk)
+    n_train = int(train_fraction * n_chars)
+    counts = Counter()
+    for split, piece in iter_pieces(input_path, n_train):
+        if split == 'train':
+            counts.update(WORD_PATTERN.findall(piece))
+    tokenizer = BPETokenizer.train_counts(counts, vocab_size, sorted(chars))
+    del counts
+    dtype = np.uint8 if tokenizer.vocab_size <= 256 else np.uint16
+    assert tokenizer.vocab_size <= 1 << 16, f'vocab size {tokenizer.vocab_size} does not fit in uint16'
+    n_tokens = {'train': 0, 'val': 0}
+    with open(os.path.join(out_dir, 'train.bin'), 'wb') as train_f, open(os.path.join(out_dir, 'val.bin'), 'wb') as val_f:
+        for split, piece in iter_pieces(input_path, n_train):
+            ids = np.array(tokenizer.encode(piece), dtype=dtype)
+            ids.tofile(train_f if split == 'train' else val_f)
+            n_tokens[split] += len(ids)
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'chars': tokenizer.chars, 'merges': tokenizer.merges, 'dtype': np.dtype(dtype).name}, f, ensure_ascii=False)
+    print(f"{n_chars:,} characters, vocab size {tokenizer.vocab_size} ({len(tokenizer.merges)} merges), {np.dtype(dtype).name} ids")
+    print(f"train has {n_tokens['train']:,} tokens, val has {n_tokens['val']:,} tokens, {n_chars / max(1, sum(n_tokens.values())):.2f} characters per token")
+
+def prepare(input_path, bpe_vocab_size=0, out_dir=None):
+    # writes next to the input unless out_dir is given, bpe_vocab_size > 0 trains a BPE tokenizer
+    out_dir = out_dir or os.path.dirname(os.path.abspath(input_path))
+    if bpe_vocab_size:
+        return prepare_bpe(input_path, out_dir, bpe_vocab_size)
+
+    # first pass: vocabulary and length
+    chars = set()
+    n_chars = 0
+    for chunk in iter_chunks(input_path):
+        chars.update(chunk)
+        n_chars += len(chunk)
+    chars = sorted(chars)
+    # ids above 0xD7FF would collide with the utf-16 surrogates in encode_chunk
+    assert len(chars) <= 0xD800, f'{len(chars)} distinct characters is too many for a char-level vocabulary'
+    dtype = np.uint8 if len(chars) <= 256 else np.uint16
+    table = {ord(ch): i for i, ch in enumerate(chars)}
+
+    # second pass: encode and split, without ever holding the whole corpus
+    n_train = int(train_fraction * n_chars)
+    written = 0
+    with open(os.path.join(out_dir, 'train.bin'), 'wb') as train_f, open(os.path.join(out_dir, 'val.bin'), 'wb') as val_f:
+        for chunk in iter_chunks(input_path):
+            ids = encode_chunk(chunk, table, dtype)
+            split = max(0, min(len(ids), n_train - written))
+            ids[:split].tofile(train_f)
+            ids[split:].tofile(val_f)
+            written += len(ids)
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'chars': chars, 'dtype': np.dtype(dtype).name}, f, ensure_ascii=False)
+    print(f"{n_chars:,} characters, vocab size {len(chars)}, {np.dtype(dtype).name} ids")
+    print(f"train has {n_train:,} tokens, val has {n_chars - n_train:,} tokens")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='encode a text corpus for the char-level trainers')
+    parser.add_argument('input', help='utf-8 text file, the outputs are written next to it')
+    parser.add_argument('--bpe_vocab_size', type=int, default=0, help='train a byte-pair encoding with this many ids instead of using characters')
+    args = parser.parse_args()
+    prepare(args.input, args.bpe_vocab_size)
@@ -0,0 +1,86 @@
+import contextlib
+import resource
+import time
+from collections import defaultdict
+
+import torch
+
+# where the time of a training run goes: wall-clock seconds per phase of the step, throughput
+# and peak memory between two summaries, and an optional torch.profiler trace of a few steps
+
+class PhaseTimer:
+    """ accumulates wall-clock time per named phase and the work done, until summary() resets it """
+
+    def __init__(self, device='cpu', enabled=True):
+        self.enabled = enabled
+        # cuda kernels are launched asynchronously, without a sync at every phase boundary their time
+        # would land in whichever phase happens to wait for them next
+        self.sync = enabled and device == 'cuda'
+        self.reset()
+
+    def reset(self):
+        self.seconds = defaultdict(float)
+        self.steps = self.samples = self.tokens = 0
+        self.t0 = time.perf_counter()
+        if self.sync:
+            torch.cuda.reset_peak_memory_stats()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # the phase is also a labelled range in torch.profiler traces
+        with torch.profiler.record_function(name):
+            if not self.enabled:
+                yield
+                return
+            if self.sync:
+                torch.cuda.synchronize()
+            t0 = time.perf_counter()
+            yield
+            if self.sync:
+                torch.cuda.synchronize()
+            self.seconds[name] += time.perf_counter() - t0
+
+    def step(self, samples, tokens):
+        self.steps += 1
+        self.samples += samples
+        self.tokens += tokens
+
+    def peak_memory_mb(self):
+        if self.sync:
+            return torch.cuda.max_memory_allocated() / 2**20 # since the last summary
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kB on linux, whole process
+
+    def summary(self):
+        # one line over everything since the last summary, then start over
+        elapsed = time.perf_counter() - self.t0
+        if not self.enabled or self.steps == 0 or elapsed == 0:
+            self.reset()
+            return ''
+        shares = ' '.join(f"{name} {100 * s / elapsed:.1f}%" for name, s in self.seconds.items())
+        line = (f"{1000 * elapsed / self.steps:.0f} ms/step ({shares}), "
+                f"{self.tokens / elapsed:,.0f} tokens/sec, {self.samples / elapsed:.1f} samples/sec, "
+                f"peak mem {self.peak_memory_mb():,.0f} MB")
+        self.reset()
+        return line
+
+def trace_profiler(path, start, steps, device='cpu'):
+    # torch.profiler over `steps` steps after skipping `start` of them (and one more as warmup),
+    # written as a Chrome trace (chrome://tracing or https://ui.perfetto.dev), call .step() after every step;
+    # .trace_written tells whether the run got far enough for the trace to be exported
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if device == 'cuda':
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+    def on_trace_ready(prof):
+        prof.export_chrome_trace(path)
+        prof.trace_written = True
+
+    profiler = torch.profiler.profile(
+        activities=activities,
+        schedule=torch.profiler.schedule(wait=max(0, start - 1), warmup=1, active=steps, repeat=1),
+        on_trace_ready=on_trace_ready,
+        record_shapes=True,
+        profile_memory=True,
+    )
+    profiler.trace_written = False
+    return profiler
@@ -0,0 +1,40 @@
+import argparse
+import copy
+import math
+import os
+import time
+
+import torch
+
+from checkpoint import load_pretrained, save_int8
+from data import CharDataset
+from gpt import TrainConfig, evaluate
+from model import quantize_int8
+
+# writes the dynamic int8 version of a checkpoint (model_int8.pt, load it with sample.py/serve.py --int8)
+# and compares it with fp32 on the cpu: validation perplexity, decoding tokens/sec and size on disk
+#
+#   python quantize.py
+
+parser = argparse.ArgumentParser(description='quantize a GPTLanguageModel checkpoint to dynamic int8')
+parser.add_argument('--checkpoint_dir', default=TrainConfig.checkpoint_dir)
+parser.add_argument('--data_dir', default=TrainConfig.data_dir)
+parser.add_argument('--max_new_tokens', type=int, default=200, help='tokens generated for the speed comparison')
+args = parser.parse_args()
+
+fp32, _ = load_pretrained(args.checkpoint_dir)
+fp32 = fp32.cpu()
+int8 = quantize_int8(copy.deepcopy(fp32))
+save_int8(int8, args.checkpoint_dir)
+
+eval_set = {'val': CharDataset(args.data_dir).eval_windows('val', TrainConfig.eval_windows, fp32.config.block_size)}
+context = torch.zeros((1, 1), dtype=torch.long)
+print(f"{'model':<8}{'val loss':>10}{'val ppl':>10}{'tokens/sec':>12}{'size MB':>10}")
+for name, model, file in (('fp32', fp32, 'model.pt'), ('int8', int8, 'model_int8.pt')):
+    loss = evaluate(model, eval_set, TrainConfig.eval_batch_size)['val']
+    torch.manual_seed(1337)
+    t0 = time.perf_counter()
+    model.generate(context, max_new_tokens=args.max_new_tokens)
+    tps = args.max_new_tokens / (time.perf_counter() - t0)
+    size = os.path.getsize(os.path.join(args.checkpoint_dir, file)) / 1e6
+    print(f"{name:<8}{loss:>10.4f}{math.exp(loss):>10.3f}{tps:>12.1f}{size:>10.1f}")
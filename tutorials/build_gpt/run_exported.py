@@ -0,0 +1,59 @@
+import argparse
+import json
+import time
+
+t_start = time.perf_counter()
+
+import torch
+
+from tokenizer import BPETokenizer
+
+# generates from the TorchScript decode step written by export.py, without the model or training code
+#
+#   python run_exported.py --prompt "Dorothy" --max_new_tokens 500
+
+def load(path):
+    # the decode step, its config and its tokenizer, all from the one archive
+    extra_files = {'config.json': '', 'tokenizer.json': ''}
+    step = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+    config = json.loads(extra_files['config.json'])
+    vocab = json.loads(extra_files['tokenizer.json'])
+    return step, config, BPETokenizer(vocab['chars'], vocab['merges'])
+
+@torch.inference_mode()
+def generate_stream(step, config, idx, max_new_tokens, temperature=1.0):
+    # idx is (B, T) array of indices in the current context, yields every (B, 1) sampled batch;
+    # the same windowing as GPTLanguageModel.generate: cached steps up to block_size, then the window is recomputed
+    block_size = config['block_size']
+    head_size = config['n_embd'] // config['n_head']
+    empty = torch.zeros((config['n_layer'], idx.shape[0], config['n_head'], 0, head_size))
+    k_cache = v_cache = empty
+    for _ in range(max_new_tokens):
+        if idx.shape[1] > block_size:
+            logits, _, _ = step(idx[:, -block_size:], empty, empty)
+        else:
+            logits, k_cache, v_cache = step(idx[:, k_cache.shape[3]:], k_cache, v_cache)
+        if temperature == 0:
+            idx_next = torch.argmax(logits, dim=-1, keepdim=True)
+        else:
+            idx_next = torch.multinomial(torch.softmax(logits / temperature, dim=-1), num_samples=1)
+        idx = torch.cat((idx, idx_next), dim=1)
+        yield idx_next
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='sample from a model exported by export.py')
+    parser.add_argument('--artifact', default='checkpoints/model.ts')
+    parser.add_argument('--prompt', default='', help='text to continue, empty starts from token 0')
+    parser.add_argument('--max_new_tokens', type=int, default=500)
+    parser.add_argument('--temperature', type=float, default=1.0, help='0 is greedy decoding')
+    parser.add_argument('--seed', type=int, default=1337)
+    args = parser.parse_args()
+
+    step, config, tokenizer = load(args.artifact)
+    torch.manual_seed(args.seed)
+    context = torch.tensor([tokenizer.encode(args.prompt) or [0]], dtype=torch.long)
+    for i, idx_next in enumerate(generate_stream(step, config, context, args.max_new_tokens, args.temperature)):
+        if i == 0:
+            print(f"first token after {(time.perf_counter() - t_start)*1000:.0f} ms")
+        print(tokenizer.decode(idx_next[0].tolist()), end='', flush=True)
+    print()
@@ -0,0 +1,42 @@
+import argparse
+import time
+
+t_start = time.perf_counter()
+
+import torch
+
+from checkpoint import load_pretrained
+
+# generate from a checkpoint written by gpt.py, without training anything
+#
+#   python sample.py --max_new_tokens 500 --prompt "Dorothy"
+
+parser = argparse.ArgumentParser(description='sample from a trained GPTLanguageModel checkpoint')
+parser.add_argument('--checkpoint_dir', default='checkpoints')
+parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+parser.add_argument('--prompt', default='', help='text to continue, empty starts from token 0')
+parser.add_argument('--max_new_tokens', type=int, default=500)
+parser.add_argument('--int8', action='store_true', help='use the quantized model written by quantize.py')
+parser.add_argument('--temperature', type=float, default=1.0, help='0 is greedy decoding')
+parser.add_argument('--top_k', type=int, default=None, help='sample only from the k most likely tokens')
+parser.add_argument('--top_p', type=float, default=None, help='sample only from the most likely tokens covering this probability mass')
+parser.add_argument('--stream', action='store_true', help='print every token as soon as it is sampled')
+parser.add_argument('--seed', type=int, default=1337)
+args = parser.parse_args()
+
+model, tokenizer = load_pretrained(args.checkpoint_dir, args.device, int8=args.int8)
+device = model.device
+print(f"model ready in {(time.perf_counter() - t_start)*1000:.0f} ms")
+
+torch.manual_seed(args.seed)
+if args.prompt:
+    context = torch.tensor([tokenizer.encode(args.prompt)], dtype=torch.long, device=device)
+else:
+    context = torch.zeros((1, 1), dtype=torch.long, device=device)
+sampling = dict(temperature=args.temperature, top_k=args.top_k, top_p=args.top_p)
+if args.stream:
+    for idx_next in model.generate_stream(context, max_new_tokens=args.max_new_tokens, **sampling):
+        print(tokenizer.decode([idx_next[0].item()]), end='', flush=True)
+    print()
+else:
+    print(tokenizer.decode(model.generate(context, max_new_tokens=args.max_new_tokens, **sampling)[0].tolist()))
@@ -0,0 +1,129 @@
+import argparse
+import itertools
+import json
+import math
+import sys
+import time
+
+import torch
+from torch.nn import functional as F
+
+from checkpoint import load_pretrained
+
+# log-likelihood and perplexity of every line of a text or JSONL file under a checkpoint written by gpt.py,
+# streamed: the input is read buffer_items lines at a time, sorted by length into batches of about
+# batch_tokens tokens so there is little padding, and one JSON line per item is written in input order
+#
+#   python score.py candidates.txt --output scores.jsonl
+#   python score.py candidates.jsonl --field text --batch_tokens 32768
+
+def read_items(path, field=None):
+    # yields a (text, error) pair for every line: its text, or its `field` for JSONL, and None; a line
+    # without such text yields (None, why) instead, so one bad line doesn't end the run and the ids stay aligned
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not field:
+                yield line, None
+                continue
+            try:
+                text = json.loads(line)[field]
+            except json.JSONDecodeError as e:
+                yield None, f"invalid JSON: {e}"
+                continue
+            except (KeyError, TypeError):
+                yield None, f"no {field!r} field"
+                continue
+            if not isinstance(text, str):
+                yield None, f"{field!r} is not a string"
+                continue
+            yield text, None
+
+def pieces(ids, block_size):
+    # a sequence of len + 1 tokens (with the leading start token) scored in windows of at most
+    # block_size + 1 tokens, each predicting block_size of them; a window only sees its own context
+    return [ids[i:i+block_size+1] for i in range(0, max(len(ids) - 1, 1), block_size)]
+
+def length_batches(pieces, batch_tokens):
+    # (item, piece) pairs sorted by length, cut into batches of at most batch_tokens padded tokens
+    batch = []
+    for item, piece in sorted(pieces, key=lambda p: len(p[1])):
+        # sorted ascending, so this piece is the longest of the batch so far
+        if batch and (len(batch) + 1) * len(piece) > batch_tokens:
+            yield batch
+            batch = []
+        batch.append((item, piece))
+    if batch:
+        yield batch
+
+@torch.inference_mode()
+def score_batch(model, batch, device):
+    # summed log-likelihood of every piece of the batch, right padded, the padding is never a target
+    T = max(len(piece) for _, piece in batch)
+    idx = torch.zeros((len(batch), T), dtype=torch.long)
+    targets = torch.full((len(batch), T - 1), -1, dtype=torch.long)
+    for row, (_, piece) in enumerate(batch):
+        idx[row, :len(piece)] = torch.tensor(piece)
+        targets[row, :len(piece)-1] = idx[row, 1:len(piece)]
+    logits, _ = model(idx[:, :-1].to(device))
+    nll = F.cross_entropy(logits.flatten(0, 1).float(), targets.flatten().to(device), ignore_index=-1, reduction='none')
+    return (-nll.view(len(batch), T - 1).sum(dim=1)).tolist()
+
+def score_items(model, tokenizer, items, batch_tokens=16384, buffer_items=8192):
+    # items are the (text, error) pairs of read_items, yields one result dict per item, in input order;
+    # memory is bounded by buffer_items
+    block_size = model.config.block_size
+    device = model.device
+    items = iter(items)
+    n = 0
+    while True:
+        buffer = list(itertools.islice(items, buffer_items))
+        if not buffer:
+            return
+        results = [None] * len(buffer)
+        work = []
+        for i, (text, error) in enumerate(buffer):
+            if error is not None:
+                results[i] = {'id': n + i, 'error': error}
+                continue
+            try:
+                # token 0 in front, like generation starts from it, so the first token is scored too
+                ids = [0] + tokenizer.encode(text)
+            except KeyError as e:
+                results[i] = {'id': n + i, 'error': f"character {e} is not in the vocabulary"}
+                continue
+            results[i] = {'id': n + i, 'log_likelihood': 0.0, 'tokens': len(ids) - 1, 'chars': len(text)}
+            work += [(i, piece) for piece in pieces(ids, block_size) if len(piece) > 1]
+        for batch in length_batches(work, batch_tokens):
+            for (i, _), ll in zip(batch, score_batch(model, batch, device)):
+                results[i]['log_likelihood'] += ll
+        for result in results:
+            if 'error' not in result and result['tokens'] > 0:
+                result['perplexity'] = math.exp(-result['log_likelihood'] / result['tokens'])
+            yield result
+        n += len(buffer)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='score every line of a file with a trained GPTLanguageModel')
+    parser.add_argument('input', help='text file (one item per line) or JSONL with --field')
+    parser.add_argument('--field', default=None, help='JSONL key holding the text to score')
+    parser.add_argument('--output', default='-', help="JSONL file for the per-item scores, '-' for stdout")
+    parser.add_argument('--checkpoint_dir', default='checkpoints')
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--int8', action='store_true', help='use the quantized model written by quantize.py')
+    parser.add_argument('--batch_tokens', type=int, default=16384, help='padded tokens per forward pass')
+    parser.add_argument('--buffer_items', type=int, default=8192, help='items read and sorted by length at a time')
+    args = parser.parse_args()
+
+    model, tokenizer = load_pretrained(args.checkpoint_dir, args.device, int8=args.int8)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    t0 = time.perf_counter()
+    n_items = n_tokens = 0
+    for result in score_items(model, tokenizer, read_items(args.input, args.field), args.batch_tokens, args.buffer_items):
+        out.write(json.dumps(result) + '\n')
+        n_items += 1
+        n_tokens += result.get('tokens', 0)
+    dt = time.perf_counter() - t0
+    if out is not sys.stdout:
+        out.close()
+    print(f"{n_items:,} items, {n_tokens:,} tokens in {dt:.1f}s: {n_items / dt:,.0f} items/sec, {n_tokens / dt:,.0f} tokens/sec", file=sys.stderr)
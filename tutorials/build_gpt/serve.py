@@ -0,0 +1,197 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+from torch.nn import functional as F
+
+from checkpoint import load_pretrained
+from generation import left_pad
+from model import MultiHeadAttention
+
+# local HTTP server that loads a checkpoint once and serves many generation requests,
+# merging all in-flight requests into one batched forward pass per step; every request keeps
+# its own kv cache, so a step only runs the newest token of every request through the model
+#
+#   python serve.py --port 8000
+#   curl -d '{"prompt": "Dorothy", "max_new_tokens": 100}' localhost:8000/generate
+
+class GenerationRequest:
+
+    def __init__(self, ids, max_new_tokens):
+        self.ids = list(ids) # prompt followed by the tokens generated so far
+        self.max_new_tokens = max_new_tokens
+        self.n_generated = 0
+        self.cache = None # per layer (k, v) of (nh, T, hs) for every token of ids but the last one
+        self.error = None # set when the step it was part of failed
+        self.done = threading.Event()
+
+class BatchingEngine:
+    """ continuous batching: requests join the running batch between steps and leave it as soon as they finish """
+
+    def __init__(self, model, max_batch_size=32):
+        self.model = model
+        self.device = model.device
+        self.block_size = model.config.block_size
+        self.max_batch_size = max_batch_size
+        self.waiting = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, ids, max_new_tokens):
+        request = GenerationRequest(ids, max_new_tokens)
+        self.waiting.put(request)
+        return request
+
+    def _loop(self):
+        active = []
+        while True:
+            # admit new requests between steps, sleep on the queue while idle
+            if not active:
+                active.append(self.waiting.get())
+            while len(active) < self.max_batch_size:
+                try:
+                    active.append(self.waiting.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._step(active)
+            except Exception as e:
+                # fail the requests of this step, the engine keeps serving the next ones
+                for request in active:
+                    request.error = e
+                    request.done.set()
+                active = []
+                continue
+            # evict the finished ones
+            for request in active:
+                if request.n_generated >= request.max_new_tokens:
+                    request.done.set()
+            active = [r for r in active if not r.done.is_set()]
+
+    def _attention(self):
+        return [m for m in self.model.modules() if isinstance(m, MultiHeadAttention)]
+
+    def _keep_caches(self, requests, lengths):
+        # every request takes its rows of the batch caches, without the left padding
+        layers = self._attention()
+        for row, (request, n) in enumerate(zip(requests, lengths)):
+            request.cache = [(m.k_cache[row, :, -n:], m.v_cache[row, :, -n:]) for m in layers]
+
+    def _prefill(self, requests):
+        # new requests, and those whose context slid past block_size (every token moved to a new
+        # position, like in generate): the last block_size tokens, left padded into one batch
+        contexts = [r.ids[-self.block_size:] for r in requests]
+        idx, mask = left_pad(contexts, device=self.device)
+        self.model.reset_cache()
+        logits, _ = self.model(idx, use_cache=True, attention_mask=mask) # (B, T, C)
+        self._keep_caches(requests, [len(c) for c in contexts])
+        return logits[:, -1, :]
+
+    def _decode(self, requests):
+        # the newest token of every request against its cache, the caches left padded to the longest
+        lengths = [r.cache[0][0].shape[1] for r in requests]
+        L = max(lengths)
+        mask = torch.zeros((len(requests), L + 1), dtype=torch.long, device=self.device)
+        for row, n in enumerate(lengths):
+            mask[row, L-n:] = 1
+        for i, m in enumerate(self._attention()):
+            k, v = requests[0].cache[i]
+            m.k_cache = k.new_zeros((len(requests), k.shape[0], L, k.shape[2]))
+            m.v_cache = v.new_zeros((len(requests), v.shape[0], L, v.shape[2]))
+            for row, (request, n) in enumerate(zip(requests, lengths)):
+                m.k_cache[row, :, L-n:], m.v_cache[row, :, L-n:] = request.cache[i]
+        self.model.cache_len = L
+        idx = torch.tensor([[r.ids[-1]] for r in requests], dtype=torch.long, device=self.device)
+        logits, _ = self.model(idx, use_cache=True, attention_mask=mask) # (B, 1, C)
+        self._keep_caches(requests, [n + 1 for n in lengths])
+        return logits[:, -1, :]
+
+    @torch.no_grad()
+    def _step(self, active):
+        # one new token for every active request: a batched prefill of the ones without a usable
+        # cache, then a batched one-token decode of the rest
+        prefill = [r for r in active if r.cache is None or r.cache[0][0].shape[1] + 1 > self.block_size]
+        decode = [r for r in active if r not in prefill]
+        logits = []
+        try:
+            if prefill:
+                logits.append(self._prefill(prefill))
+            if decode:
+                logits.append(self._decode(decode))
+        finally:
+            self.model.reset_cache()
+        probs = F.softmax(torch.cat(logits), dim=-1) # (B, C)
+        idx_next = torch.multinomial(probs, num_samples=1)[:, 0].tolist() # (B,)
+        for request, token in zip(prefill + decode, idx_next):
+            request.ids.append(token)
+            request.n_generated += 1
+
+def make_handler(engine, tokenizer):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            if self.path != '/generate':
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                prompt = body.get('prompt', '')
+                max_new_tokens = int(body.get('max_new_tokens', 100))
+            except (ValueError, TypeError, AttributeError):
+                self.send_error(400, "expected a JSON object with a prompt string and an integer max_new_tokens")
+                return
+            if not isinstance(prompt, str):
+                self.send_error(400, "prompt must be a string")
+                return
+            if max_new_tokens <= 0:
+                # the engine generates at least one token per admitted request
+                self.send_error(400, "max_new_tokens must be positive")
+                return
+            try:
+                ids = tokenizer.encode(prompt) or [0]
+            except KeyError as e:
+                self.send_error(400, f"character {e} is not in the vocabulary")
+                return
+            request = engine.submit(ids, max_new_tokens)
+            request.done.wait()
+            if request.error is not None:
+                self.send_error(500, f"generation failed: {request.error!r}")
+                return
+            text = tokenizer.decode(request.ids[len(ids):])
+            payload = json.dumps({'text': text}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass # one line per request drowns everything else under load
+
+    return Handler
+
+def make_server(engine, tokenizer, host='127.0.0.1', port=8000):
+    # tokenizer: anything with encode/decode, a CharDataset or the BPETokenizer of a checkpoint
+    return ThreadingHTTPServer((host, port), make_handler(engine, tokenizer))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='serve a trained GPTLanguageModel checkpoint over HTTP')
+    parser.add_argument('--checkpoint_dir', default='checkpoints')
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max_batch_size', type=int, default=32)
+    parser.add_argument('--int8', action='store_true', help='serve the quantized model written by quantize.py')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    model, tokenizer = load_pretrained(args.checkpoint_dir, args.device, int8=args.int8)
+    engine = BatchingEngine(model, max_batch_size=args.max_batch_size)
+    server = make_server(engine, tokenizer, args.host, args.port)
+    print(f"model loaded in {(time.perf_counter() - t0)*1000:.0f} ms, serving on http://{args.host}:{args.port}/generate")
+    server.serve_forever()
@@ -0,0 +1,91 @@
+import torch
+import torch.nn as nn
+
+from model import next_token_probs
+
+# speculative decoding: a cheap draft model proposes k tokens one at a time, the GPT scores all of
+# them in one forward pass and keeps the longest prefix that passes rejection sampling, plus one
+# token of its own. the accepted tokens are distributed exactly as if the GPT had sampled them
+
+class BigramDraft(nn.Module):
+    """ a (V, V) table of next-token logits as a draft model, with the kv cache interface of GPTLanguageModel """
+
+    def __init__(self, log_probs):
+        super().__init__()
+        self.register_buffer('table', log_probs.float())
+        self.cache_len = 0
+
+    def reset_cache(self):
+        self.cache_len = 0
+
+    def truncate_cache(self, length):
+        self.cache_len = min(self.cache_len, length)
+
+    def forward(self, idx, targets=None, use_cache=False):
+        # a bigram only needs the token itself, so "caching" is just counting positions
+        if use_cache:
+            self.cache_len += idx.shape[1]
+        return self.table[idx], None # (B,T,C)
+
+@torch.no_grad()
+def speculative_generate(model, draft, idx, max_new_tokens, k=4, temperature=1.0, top_k=None, top_p=None):
+    # idx is the (1, T) context, returns it with max_new_tokens appended and the acceptance stats.
+    # the rejected tokens are cut from the kv caches, which only works while they start at
+    # position 0, so the whole sequence has to fit in block_size
+    assert idx.shape[0] == 1, 'every sequence accepts a different number of draft tokens, decode one at a time'
+    block_size = model.config.block_size
+    assert idx.shape[1] + max_new_tokens <= block_size, 'speculative decoding needs prompt + max_new_tokens <= block_size'
+    sampling = dict(temperature=temperature, top_k=top_k, top_p=top_p)
+    stats = {'drafted': 0, 'accepted': 0, 'target_passes': 0}
+    model.reset_cache()
+    draft.reset_cache()
+    try:
+        target_len = idx.shape[1] + max_new_tokens
+        while idx.shape[1] < target_len:
+            # one token always comes from the gpt itself, so draft at most the rest
+            n_draft = min(k, target_len - idx.shape[1] - 1)
+
+            # the draft proposes n_draft tokens, feeding it whatever it hasn't cached yet
+            draft_in = idx[:, draft.cache_len:]
+            drafted, q = [], []
+            for _ in range(n_draft):
+                logits, _ = draft(draft_in, use_cache=True)
+                probs = next_token_probs(logits[:, -1, :], **sampling) # (1, C)
+                draft_in = torch.multinomial(probs, num_samples=1) if temperature > 0 else probs.argmax(-1, keepdim=True)
+                drafted.append(draft_in)
+                q.append(probs)
+
+            # the gpt scores every drafted position (and the one after them) in a single forward pass
+            proposal = torch.cat([idx] + drafted, dim=1)
+            logits, _ = model(proposal[:, model.cache_len:], use_cache=True)
+            p = [next_token_probs(logits[:, i, :], **sampling) for i in range(logits.shape[1] - n_draft - 1, logits.shape[1])]
+            stats['target_passes'] += 1
+            stats['drafted'] += n_draft
+
+            # accept draft token x with probability min(1, p(x) / q(x)), at the first rejection
+            # sample from what p has more of than q instead, that is exactly p overall
+            accepted = []
+            for i in range(n_draft):
+                x = drafted[i][0, 0]
+                if torch.rand(()) * q[i][0, x] < p[i][0, x]:
+                    accepted.append(drafted[i])
+                    continue
+                residual = (p[i] - q[i]).clamp(min=0)
+                residual = residual if residual.sum() > 0 else p[i]
+                accepted.append(torch.multinomial(residual / residual.sum(), num_samples=1))
+                break
+            else:
+                # every draft token passed, the gpt's prediction after the last one comes for free
+                probs = p[n_draft]
+                accepted.append(torch.multinomial(probs, num_samples=1) if temperature > 0 else probs.argmax(-1, keepdim=True))
+            stats['accepted'] += len(accepted) - 1 # all but the gpt's own token
+
+            idx = torch.cat([idx] + accepted, dim=1)
+            # the caches keep only positions that are now part of idx, the last token is fed next round
+            model.truncate_cache(idx.shape[1] - 1)
+            draft.truncate_cache(idx.shape[1] - 1)
+    finally:
+        model.reset_cache()
+        draft.reset_cache()
+    stats['acceptance_rate'] = stats['accepted'] / max(stats['drafted'], 1)
+    return idx, stats
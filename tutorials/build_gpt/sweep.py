@@ -0,0 +1,123 @@
+import csv
+import dataclasses
+import itertools
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+import torch.multiprocessing as mp
+
+from data import CharDataset
+from gpt import TrainConfig, train
+from model import GPTConfig
+
+# hyperparameter sweep: trials run in parallel in a process pool, each with its share of the cores,
+# trials whose validation loss is clearly behind the others get stopped early (median rule)
+#
+#   python sweep.py    # writes sweep_results.csv: iter, seconds and losses of every evaluation of every trial
+
+# hyperparameters
+search_space = {
+    'learning_rate': [1e-3, 3e-4, 1e-4],
+    'n_layer': [4, 6],
+    'n_head': [4, 6],
+    'dropout': [0.1, 0.2],
+}
+n_trials = 12 # sampled from the grid above, every combination when it has no more than this
+threads_per_trial = 2 # intra-op threads of every trial, the pool gets cores // threads_per_trial workers
+grace_evals = 2 # evaluations every trial gets before it can be pruned
+min_peers = 3 # other trials that must have reached a step before the median there is trusted
+results_file = 'sweep_results.csv'
+base_model = GPTConfig(n_embd=192) # n_embd must split evenly over every n_head in the space
+base_train = TrainConfig(max_iters=2000, eval_interval=100, eval_windows=256,
+                         checkpoint_dir='', sample_tokens=0, prefetch=False)
+# ------------
+
+_dataset = None
+
+def _init_worker(threads, data_dir):
+    # once per pool process: its thread budget and the memmapped dataset every trial in it reuses,
+    # the .bin files are mapped read-only so all workers share the same pages of the page cache
+    global _dataset
+    torch.set_num_threads(threads)
+    _dataset = CharDataset(data_dir)
+
+def median_rule(trial_id, curves):
+    # should_stop for train(): stop once this trial's best val loss is worse than the median
+    # of the other trials' best val loss at the same step
+    best = float('inf')
+    seen = 0
+    def should_stop(iter, losses):
+        nonlocal best, seen
+        best = min(best, losses['val'])
+        seen += 1
+        curve = curves[trial_id]
+        curve.append((iter, losses['val']))
+        curves[trial_id] = curve # proxies only see assignments, not in-place appends
+        if seen <= grace_evals:
+            return False
+        peers = [min(v for i, v in other if i <= iter) for tid, other in curves.items()
+                 if tid != trial_id and any(i >= iter for i, _ in other)]
+        return len(peers) >= min_peers and best > statistics.median(peers)
+    return should_stop
+
+def run_trial(trial_id, params, curves):
+    model_fields = {f.name for f in dataclasses.fields(GPTConfig)}
+    model_config = dataclasses.replace(base_model, **{k: v for k, v in params.items() if k in model_fields})
+    config = dataclasses.replace(base_train, **{k: v for k, v in params.items() if k not in model_fields})
+    curves[trial_id] = []
+    should_stop = median_rule(trial_id, curves)
+    timeline = [] # (iter, seconds since the trial started, train loss, val loss)
+    t0 = time.perf_counter()
+    def record(iter, losses):
+        timeline.append((iter, time.perf_counter() - t0, losses['train'], losses['val']))
+        return should_stop(iter, losses)
+    train(model_config, config, dataset=_dataset, should_stop=record)
+    pruned = timeline[-1][0] < config.max_iters - 1
+    return trial_id, params, timeline, pruned
+
+def sample_trials(space, n, seed=1337):
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    if len(grid) <= n:
+        return grid
+    return random.Random(seed).sample(grid, n)
+
+if __name__ == '__main__':
+    trials = sample_trials(search_space, n_trials)
+    cores = os.cpu_count() or 1
+    threads = min(threads_per_trial, cores)
+    workers = max(1, min(len(trials), cores // threads))
+    print(f"{len(trials)} trials on {workers} workers x {threads} threads ({cores} cores)")
+    ctx = mp.get_context('spawn')
+    t0 = time.perf_counter()
+    with ctx.Manager() as manager:
+        curves = manager.dict() # trial id -> [(iter, val loss)], what the pruning rule compares against
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(threads, base_train.data_dir)) as pool:
+            futures = [pool.submit(run_trial, i, params, curves) for i, params in enumerate(trials)]
+            results = []
+            for future in as_completed(futures):
+                trial_id, params, timeline, pruned = future.result()
+                results.append((trial_id, params, timeline, pruned))
+                print(f"trial {trial_id} {'pruned' if pruned else 'done'} at step {timeline[-1][0]}, "
+                      f"val loss {timeline[-1][3]:.4f} after {timeline[-1][1]:.0f}s")
+    total = time.perf_counter() - t0
+
+    with open(results_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['trial', *search_space, 'iter', 'seconds', 'train_loss', 'val_loss'])
+        for trial_id, params, timeline, pruned in sorted(results, key=lambda r: r[0]):
+            for iter, seconds, train_loss, val_loss in timeline:
+                writer.writerow([trial_id, *params.values(), iter, f'{seconds:.2f}', f'{train_loss:.4f}', f'{val_loss:.4f}'])
+
+    # summary, best validation loss first
+    header = ''.join(f'{k:>15}' for k in search_space)
+    print(f"\n{'trial':<7}{header}{'status':>9}{'steps':>7}{'seconds':>9}{'best val':>10}")
+    for trial_id, params, timeline, pruned in sorted(results, key=lambda r: min(t[3] for t in r[2])):
+        values = ''.join(f'{v:>15g}' for v in params.values())
+        status = 'pruned' if pruned else 'done'
+        print(f"{trial_id:<7}{values}{status:>9}{timeline[-1][0]:>7}{timeline[-1][1]:>9.0f}{min(t[3] for t in timeline):>10.4f}")
+    print(f"sweep took {total:.0f}s, loss curves in {results_file}")
@@ -0,0 +1,107 @@
+import functools
+import json
+import re
+from collections import Counter, defaultdict
+
+# text is split into words (a leading space stays with its word) before merging, so merges
+# never cross a word boundary and every distinct word only has to be encoded once
+WORD_PATTERN = re.compile(r" ?\w+| ?[^\w\s]+|\s+(?!\S)|\s+")
+
+class BPETokenizer:
+    """ byte-pair encoding over the corpus characters: ids below len(chars) are single characters,
+    id len(chars) + r is the r-th merge. without merges it is the char-level vocabulary """
+
+    def __init__(self, chars, merges=(), cache_size=1 << 16):
+        self.chars = list(chars)
+        self.merges = [tuple(pair) for pair in merges]
+        self.stoi = { ch:i for i,ch in enumerate(self.chars) }
+        # merge-rank table: the lower the rank the earlier the pair was merged during training
+        self.ranks = { pair:r for r, pair in enumerate(self.merges) }
+        self.vocab = list(self.chars) # id -> the text it stands for
+        for a, b in self.merges:
+            self.vocab.append(self.vocab[a] + self.vocab[b])
+        self.vocab_size = len(self.vocab)
+        # repeated words skip the merge loop, cache_size=0 turns the cache off
+        self._encode_word = functools.lru_cache(maxsize=cache_size)(self._merge_word) if cache_size else self._merge_word
+
+    @classmethod
+    def train(cls, text, vocab_size, chars=None):
+        # learn vocab_size - len(chars) merges from text, always merging the most frequent adjacent pair
+        chars = sorted(set(text)) if chars is None else chars
+        return cls.train_counts(Counter(WORD_PATTERN.findall(text)), vocab_size, chars)
+
+    @classmethod
+    def train_counts(cls, counts, vocab_size, chars):
+        # the same from a Counter of the WORD_PATTERN words of the text, which can be built a chunk at a time
+        chars = list(chars)
+        stoi = { ch:i for i,ch in enumerate(chars) }
+        words = [[stoi[c] for c in word] for word in counts]
+        freqs = list(counts.values())
+        pair_counts = Counter()
+        where = defaultdict(set) # pair -> words it (once) occurred in, checked again before merging
+        for i, ids in enumerate(words):
+            for pair in zip(ids, ids[1:]):
+                pair_counts[pair] += freqs[i]
+                where[pair].add(i)
+        merges = []
+        while len(chars) + len(merges) < vocab_size and pair_counts:
+            best = max(pair_counts, key=pair_counts.get)
+            new_id = len(chars) + len(merges)
+            merges.append(best)
+            # only the words containing the pair change, update their pair counts in place
+            for i in where.pop(best):
+                ids = words[i]
+                for pair in zip(ids, ids[1:]):
+                    pair_counts[pair] -= freqs[i]
+                    if pair_counts[pair] <= 0:
+                        del pair_counts[pair]
+                ids = words[i] = cls._merge(ids, best, new_id)
+                for pair in zip(ids, ids[1:]):
+                    pair_counts[pair] += freqs[i]
+                    where[pair].add(i)
+        return cls(chars, merges)
+
+    @staticmethod
+    def _merge(ids, pair, new_id):
+        # replace every occurrence of pair in ids with new_id
+        out = []
+        i = 0
+        while i < len(ids):
+            if i < len(ids) - 1 and ids[i] == pair[0] and ids[i+1] == pair[1]:
+                out.append(new_id)
+                i += 2
+            else:
+                out.append(ids[i])
+                i += 1
+        return out
+
+    def _merge_word(self, word):
+        ids = [self.stoi[c] for c in word]
+        while len(ids) > 1:
+            # apply the earliest learned merge first, like during training
+            pair = min(zip(ids, ids[1:]), key=lambda p: self.ranks.get(p, len(self.ranks)))
+            if pair not in self.ranks:
+                break
+            ids = self._merge(ids, pair, len(self.chars) + self.ranks[pair])
+        return tuple(ids)
+
+    def encode(self, s):
+        # encoder: take a string, output a list of integers
+        out = []
+        for word in WORD_PATTERN.findall(s):
+            out.extend(self._encode_word(word))
+        return out
+
+    def decode(self, l):
+        # decoder: take a list of integers, output a string
+        return ''.join([self.vocab[i] for i in l])
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'chars': self.chars, 'merges': self.merges}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(meta['chars'], meta.get('merges', []))